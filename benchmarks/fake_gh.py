@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Stand-in for `gh`, serving a synthetic repository from a scenario file.
+
+Understands just enough of `gh api` & `gh pr create` for
+`j stack` to run; the scenario is read from `$FAKE_GH_SCENARIO`.
+"""
+import json
+import os
+import re
+import sys
+
+# Every response carries it; a request revalidating it gets `304`.
+ETAG = 'W/"benchmark"'
+
+PAGE_SIZE = 100
+
+
+def _read_fields(args: list[str]) -> dict[str, list[str]]:
+    """Collect `-f name=value` & `-F name=value` arguments."""
+    fields: dict[str, list[str]] = {}
+    for flag, argument in zip(args, args[1:]):
+        if flag in {"-f", "-F"}:
+            name, _equals, field_value = argument.partition("=")
+            fields.setdefault(name.removesuffix("[]"), []).append(field_value)
+
+    return fields
+
+
+def _find_nodes(pull_requests: list[dict], **conditions: str) -> list[dict]:
+    return [
+        pr
+        for pr in pull_requests
+        if all(pr[name] == value for name, value in conditions.items())
+    ]
+
+
+def _respond_to_pull_requests_page(scenario: dict, fields: dict) -> dict:
+    pull_requests = scenario["pullRequests"]
+    after = fields.get("after", ["null"])[0]
+    start = 0 if after == "null" else int(after)
+    branch = fields["branch"][0]
+
+    repository = {
+        "defaultBranchRef": {"name": scenario["defaultBranch"]},
+        "pullRequests": {
+            "pageInfo": {
+                "hasNextPage": start + PAGE_SIZE < len(pull_requests),
+                "endCursor": str(start + PAGE_SIZE),
+            },
+            "nodes": pull_requests[start:start + PAGE_SIZE],
+        },
+    }
+    if fields["isFirstPage"] == ["true"]:
+        repository["currentPullRequest"] = {
+            "nodes": _find_nodes(pull_requests, headRefName=branch)[:1],
+        }
+        repository["childPullRequests"] = {
+            "nodes": _find_nodes(pull_requests, baseRefName=branch),
+        }
+
+    return {"viewer": {"login": "benchmark"}, "repository": repository}
+
+
+def _construct_failed_checks(pull_request: dict) -> dict:
+    """Name check runs after their positions, from their counts."""
+    [commit_node] = pull_request["commits"]["nodes"]
+    contexts = commit_node["commit"]["statusCheckRollup"]["contexts"]
+    check_states = [
+        state_count["state"]
+        for state_count in contexts["checkRunCountsByState"]
+        for _index in range(state_count["count"])
+    ]
+    check_nodes = [
+        {"name": f"check-{index}", "conclusion": check_state}
+        for index, check_state in enumerate(check_states[:100])
+    ]
+    return {
+        "id": pull_request["id"],
+        "commits": {
+            "nodes": [
+                {
+                    "commit": {
+                        "statusCheckRollup": {
+                            "contexts": {**contexts, "nodes": check_nodes},
+                        },
+                    },
+                },
+            ],
+        },
+    }
+
+
+def _respond_to_graphql(scenario: dict, fields: dict) -> dict:
+    query = fields["query"][0]
+    operation = re.search(r"(?:query|mutation)\s+(\w+)", query).group(1)
+    pull_requests = scenario["pullRequests"]
+
+    if operation == "PullRequestsPage":
+        return _respond_to_pull_requests_page(scenario, fields)
+
+    if operation == "ChildPullRequests":
+        return {
+            "repository": {
+                name: {
+                    "nodes": _find_nodes(
+                        pull_requests,
+                        baseRefName=branches[0],
+                    ),
+                }
+                for name, branches in fields.items()
+                if name.startswith("branch")
+            },
+        }
+
+    if operation == "PullRequestDetails":
+        pull_request_by_id = {pr["id"]: pr for pr in pull_requests}
+        return {
+            "nodes": [pull_request_by_id.get(pr_id) for pr_id in fields["ids"]],
+        }
+
+    if operation == "FailedChecks":
+        pull_request_by_id = {pr["id"]: pr for pr in pull_requests}
+        return {
+            "nodes": [
+                _construct_failed_checks(pull_request_by_id[pr_id])
+                for pr_id in fields["ids"]
+            ],
+        }
+
+    if operation == "NavigationComments":
+        return {
+            "nodes": [
+                {"id": pr_id, "comments": {"nodes": []}}
+                for pr_id in fields["ids"]
+            ],
+        }
+
+    if operation == "MergeState":
+        return {
+            "node": {
+                "mergeable": "MERGEABLE",
+                "mergeStateStatus": "CLEAN",
+                "commits": {"nodes": []},
+            },
+        }
+
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+def _respond_to_rest(args: list[str]) -> str:
+    if f"If-None-Match: {ETAG}" in args:
+        return f"HTTP/2.0 304 Not Modified\r\nEtag: {ETAG}\r\n\r\n"
+
+    if "--input" in args:
+        sys.stdin.read()
+
+    return f"HTTP/2.0 200 OK\r\nEtag: {ETAG}\r\n\r\n[]"
+
+
+def main(args: list[str]) -> int:
+    """Respond to one `gh` invocation."""
+    with open(os.environ["FAKE_GH_SCENARIO"]) as scenario_file:
+        scenario = json.load(scenario_file)
+
+    if args[:2] == ["api", "graphql"]:
+        data = _respond_to_graphql(scenario, _read_fields(args))
+        sys.stdout.write(json.dumps({"data": data}))
+        return 0
+
+    if args[:1] == ["api"]:
+        response = _respond_to_rest(args)
+        sys.stdout.write(response)
+        return 1 if " 304 " in response.partition("\r\n")[0] else 0
+
+    if args[:2] == ["pr", "create"]:
+        sys.stdout.write("https://github.com/benchmark/repository/pull/1\n")
+        return 0
+
+    # Make the app fall back to `gh api` for everything else, like `gh auth`.
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,330 @@
+"""
+Time `j stack` internals & commands against synthetic repositories.
+
+    python benchmarks/run.py --output results.json
+
+Results are written as JSON, to be compared across releases.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+from typing import Callable
+
+import sh
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from scenarios import (  # noqa: E402
+    DEFAULT_BRANCH,
+    SCENARIOS,
+    Scenario,
+    commit_file,
+    construct_pull_requests,
+    create_repository,
+    write_scenario,
+)
+
+FAKE_GH = Path(__file__).parent / "fake_gh.py"
+
+# `split` benchmark divides a PR of that many commits into as many PRs.
+SPLIT_PARTS = 4
+
+# Identity for commits made by rebases under benchmark.
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "Benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@localhost",
+    "GIT_COMMITTER_NAME": "Benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@localhost",
+}
+
+
+@dataclass
+class Benchmark:
+    """Operation to time; `setup` runs before each repetition, untimed."""
+
+    name: str
+    run: Callable[[], object]
+    setup: Callable[[], object] = lambda: None
+
+
+def prepare_environment(directory: Path, scenario: Scenario) -> None:
+    """Put the fake `gh` first on `$PATH` and point it at the scenario."""
+    bin_directory = directory / "bin"
+    bin_directory.mkdir()
+
+    gh_path = bin_directory / "gh"
+    gh_path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_GH}" "$@"\n')
+    gh_path.chmod(0o755)  # noqa: WPS432
+
+    scenario_path = directory / "scenario.json"
+    write_scenario(scenario, scenario_path)
+
+    os.environ.update(
+        GIT_IDENTITY,
+        PATH=f"{bin_directory}{os.pathsep}{os.environ['PATH']}",
+        FAKE_GH_SCENARIO=str(scenario_path),
+        JEEVES_PR_STACK_TRANSPORT="gh",
+    )
+
+
+def construct_benchmarks(  # noqa: WPS210, WPS213
+    scenario: Scenario,
+    directory: Path,
+) -> list[Benchmark]:
+    """Benchmarks for one scenario, from pure functions to whole commands."""
+    # The application resolves `gh` when constructed: the fake one has to be
+    # on `$PATH` by then, see `prepare_environment()`.
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack import github  # noqa: WPS433
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        pull_request_stack_as_table,
+    )
+    from jeeves_pr_stack.logic import JeevesPullRequestStack  # noqa: WPS433
+    from jeeves_pr_stack.models import Commit, SplitPoint  # noqa: WPS433
+    from jeeves_pr_stack.rebase import StackRebase  # noqa: WPS433
+
+    raw_nodes = construct_pull_requests(scenario)
+    raw_pull_requests = [
+        github._normalize_pull_request(raw_node)  # noqa: WPS437
+        for raw_node in raw_nodes
+    ]
+    raw_topologies = [
+        github._normalize_topology(raw_node)  # noqa: WPS437
+        for raw_node in raw_nodes
+    ]
+    pull_request_refs = github.construct_pull_request_refs(raw_topologies)
+    parser = JeevesPullRequestStack(branch=scenario.current_branch)
+
+    def parse_pull_requests():  # noqa: WPS430
+        return [
+            parser._construct_pull_request(raw_pull_request)  # noqa: WPS437
+            for raw_pull_request in raw_pull_requests
+        ]
+
+    pull_requests = parse_pull_requests()
+    stack = github.construct_stack_for_branch(
+        scenario.current_branch,
+        pull_requests,
+    )
+
+    def render_stack():  # noqa: WPS430
+        console = Console(file=io.StringIO(), width=120, force_terminal=True)
+        console.print(
+            pull_request_stack_as_table(
+                stack,
+                current_branch=scenario.current_branch,
+                default_branch=DEFAULT_BRANCH,
+            ),
+        )
+
+    git = create_repository(directory, stack_depth=scenario.stack_depth)
+    work_tree = Path(str(git("rev-parse", "--show-toplevel")).strip())
+    os.chdir(work_tree)
+    git.switch(scenario.current_branch)
+
+    state_directory = work_tree / ".git" / "jeeves-pr-stack"
+
+    def forget_cache():  # noqa: WPS430
+        shutil.rmtree(state_directory, ignore_errors=True)
+
+    def list_stack():  # noqa: WPS430
+        return JeevesPullRequestStack().list_stack()
+
+    def list_pull_requests():  # noqa: WPS430
+        return JeevesPullRequestStack().list_pull_requests()
+
+    def list_stacks():  # noqa: WPS430
+        # What `j stack all` shows.
+        return JeevesPullRequestStack().list_stacks()
+
+    def advance_default_branch():  # noqa: WPS430
+        git.switch(DEFAULT_BRANCH)
+        commit_file(git, work_tree, "upstream.txt", str(time.time()))
+        git.push("origin", DEFAULT_BRANCH)
+        git.switch(scenario.current_branch)
+
+    def rebase():  # noqa: WPS430
+        for _step in StackRebase(git=sh.git, stack=stack).run():
+            pass  # noqa: WPS420
+
+    split_counter = iter(range(sys.maxsize))
+    split_source_branch = "split-source"
+
+    def prepare_split():  # noqa: WPS430
+        git.switch("-C", split_source_branch, scenario.current_branch)
+        for commit_number in range(SPLIT_PARTS):
+            commit_file(git, work_tree, "split.txt", f"Part {commit_number}")
+
+    def split():  # noqa: WPS430
+        application = JeevesPullRequestStack(branch=split_source_branch)
+        split_number = next(split_counter)
+        application.split(
+            pull_request_to_split=stack[-1],
+            split_points=[
+                SplitPoint(
+                    commit=Commit(
+                        oid=git("rev-parse", f"HEAD~{part}").strip(),
+                        title=f"Part {part}",
+                    ),
+                    branch=f"split-{split_number}-{part}",
+                )
+                for part in range(SPLIT_PARTS - 1, 0, -1)
+            ],
+        )
+
+    return [
+        Benchmark(
+            name="construct_stack_for_branch",
+            run=lambda: github.construct_stack_for_branch(
+                scenario.current_branch,
+                pull_request_refs,
+            ),
+        ),
+        Benchmark(name="parse_pull_requests", run=parse_pull_requests),
+        Benchmark(
+            name="construct_checks_status",
+            run=lambda: [
+                github.construct_checks_status(raw_pull_request)
+                for raw_pull_request in raw_pull_requests
+            ],
+        ),
+        Benchmark(name="render_stack", run=render_stack),
+        Benchmark(name="list_stack:cold", run=list_stack, setup=forget_cache),
+        Benchmark(name="list_stack:revalidated", run=list_stack),
+        Benchmark(
+            name="list_pull_requests:cold",
+            run=list_pull_requests,
+            setup=forget_cache,
+        ),
+        Benchmark(name="list_stacks:cold", run=list_stacks, setup=forget_cache),
+        Benchmark(name="rebase", run=rebase, setup=advance_default_branch),
+        Benchmark(name="split", run=split, setup=prepare_split),
+    ]
+
+
+def measure(benchmark: Benchmark, repeat: int) -> list[float]:
+    """Run the benchmark `repeat` times after a warm-up run."""
+    benchmark.setup()
+    benchmark.run()
+
+    durations = []
+    for _repetition in range(repeat):
+        benchmark.setup()
+        started_at = time.perf_counter()
+        benchmark.run()
+        durations.append(time.perf_counter() - started_at)
+
+    return durations
+
+
+def summarize(scenario: str, name: str, durations: list[float]) -> dict:
+    """Result of one benchmark, as written to JSON."""
+    return {
+        "scenario": scenario,
+        "benchmark": name,
+        "repeat": len(durations),
+        "unit": "s",
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+        "max": max(durations),
+    }
+
+
+def describe_environment() -> dict:
+    """Versions the results depend on."""
+    try:
+        package_version = metadata.version("jeeves-pr-stack")
+    except metadata.PackageNotFoundError:
+        package_version = None
+
+    return {
+        "package_version": package_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "git": str(sh.git("--version")).strip(),
+        "timestamp": time.time(),
+    }
+
+
+def write_results(path: Path, results: list[dict]) -> None:
+    """Store results along with the environment they were measured in."""
+    path.write_text(
+        json.dumps(
+            {"environment": describe_environment(), "results": results},
+            indent=2,
+        ),
+    )
+
+
+def main() -> None:  # noqa: WPS210
+    """Run benchmarks, print a summary, write results as JSON."""
+    scenario_by_name = {scenario.name: scenario for scenario in SCENARIOS}
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(scenario_by_name),
+        help="Scenario to run; all of them by default.",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        help="Run only benchmarks whose names contain this.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Where to write JSON.")
+    arguments = parser.parse_args()
+
+    original_environment = dict(os.environ)
+    original_directory = Path.cwd()
+
+    results = []
+    for scenario_name in arguments.scenario or list(scenario_by_name):
+        scenario = scenario_by_name[scenario_name]
+        with tempfile.TemporaryDirectory() as raw_directory:
+            directory = Path(raw_directory)
+            prepare_environment(directory, scenario)
+
+            try:
+                for benchmark in construct_benchmarks(scenario, directory):
+                    is_selected = not arguments.benchmark or any(
+                        pattern in benchmark.name
+                        for pattern in arguments.benchmark
+                    )
+                    if not is_selected:
+                        continue
+
+                    result = summarize(
+                        scenario.name,
+                        benchmark.name,
+                        measure(benchmark, repeat=arguments.repeat),
+                    )
+                    results.append(result)
+                    print(  # noqa: WPS421
+                        f"{scenario.name:12} {benchmark.name:28} "
+                        f"median {result['median'] * 1000:10.2f} ms",
+                    )
+            finally:
+                os.chdir(original_directory)
+                os.environ.clear()
+                os.environ.update(original_environment)
+
+    if arguments.output is not None:
+        write_results(arguments.output, results)
+
+
+if __name__ == "__main__":
+    main()
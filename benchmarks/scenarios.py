@@ -0,0 +1,198 @@
+"""Synthetic repositories for benchmarks."""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import sh
+
+DEFAULT_BRANCH = "main"
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Shape of a synthetic repository."""
+
+    name: str
+
+    # Open PRs in the repository, stack included.
+    pull_request_count: int
+
+    # PRs in the stack of the checked out branch.
+    stack_depth: int
+    checks_per_pull_request: int
+
+    @property
+    def current_branch(self) -> str:
+        """Top branch of the stack."""
+        return stack_branch(self.stack_depth)
+
+
+SCENARIOS = (
+    Scenario(
+        name="10-prs",
+        pull_request_count=10,
+        stack_depth=3,
+        checks_per_pull_request=5,
+    ),
+    Scenario(
+        name="1000-prs",
+        pull_request_count=1000,
+        stack_depth=5,
+        checks_per_pull_request=5,
+    ),
+    Scenario(
+        name="10000-prs",
+        pull_request_count=10000,
+        stack_depth=5,
+        checks_per_pull_request=5,
+    ),
+    Scenario(
+        name="deep-stack",
+        pull_request_count=60,
+        stack_depth=60,
+        checks_per_pull_request=5,
+    ),
+    Scenario(
+        name="many-checks",
+        pull_request_count=10,
+        stack_depth=5,
+        checks_per_pull_request=300,
+    ),
+)
+
+
+def stack_branch(level: int) -> str:
+    """Head branch of the PR at the given level of the stack, from 1."""
+    return f"stack-{level}"
+
+
+def construct_check_contexts(count: int) -> dict:
+    """Counts of mostly successful check runs with a few skipped ones."""
+    skipped_count = count // 10
+    return {
+        "checkRunCountsByState": [
+            {"state": "SUCCESS", "count": count - skipped_count},
+            {"state": "SKIPPED", "count": skipped_count},
+        ],
+        "statusContextCountsByState": [],
+    }
+
+
+def construct_pull_request(
+    number: int,
+    branch: str,
+    base_branch: str,
+    check_count: int,
+) -> dict:
+    """Raw GraphQL PR node, as `gh api graphql` returns it."""
+    return {
+        "number": number,
+        "id": f"PR_{number}",
+        "headRefName": branch,
+        "baseRefName": base_branch,
+        "isCrossRepository": False,
+        "author": {"login": "benchmark"},
+        "isDraft": False,
+        "mergeable": "MERGEABLE",
+        "title": f"Change number {number}",
+        "url": f"https://github.com/benchmark/repository/pull/{number}",
+        "reviewDecision": "REVIEW_REQUIRED",
+        "reviewRequests": {
+            "nodes": [{"requestedReviewer": {"login": "reviewer"}}],
+        },
+        "commits": {
+            "nodes": [
+                {
+                    "commit": {
+                        "statusCheckRollup": {
+                            "contexts": construct_check_contexts(check_count),
+                        },
+                    },
+                },
+            ],
+        },
+    }
+
+
+def construct_pull_requests(scenario: Scenario) -> list[dict]:
+    """
+    PRs of the scenario, most recently updated first.
+
+    Besides the stack, there are unrelated PRs directed to the default
+    branch or stacked in pairs.
+    """
+    stack = [
+        construct_pull_request(
+            number=level,
+            branch=stack_branch(level),
+            base_branch=(
+                stack_branch(level - 1) if level > 1 else DEFAULT_BRANCH
+            ),
+            check_count=scenario.checks_per_pull_request,
+        )
+        for level in range(1, scenario.stack_depth + 1)
+    ]
+
+    unrelated_count = scenario.pull_request_count - scenario.stack_depth
+    unrelated = [
+        construct_pull_request(
+            number=number,
+            branch=f"feature-{number}",
+            base_branch=(
+                f"feature-{number - 1}" if number % 2 else DEFAULT_BRANCH
+            ),
+            check_count=scenario.checks_per_pull_request,
+        )
+        for number in range(1000, 1000 + unrelated_count)
+    ]
+
+    # The stack is being worked on, so it was updated most recently.
+    return list(reversed(stack)) + unrelated
+
+
+def write_scenario(scenario: Scenario, path: Path) -> None:
+    """Store the scenario in the form `fake_gh.py` reads."""
+    path.write_text(
+        json.dumps({
+            "defaultBranch": DEFAULT_BRANCH,
+            "pullRequests": construct_pull_requests(scenario),
+        }),
+    )
+
+
+def create_repository(directory: Path, stack_depth: int) -> sh.Command:
+    """
+    Create a clone of a local bare remote with a stack of branches.
+
+    Every branch of the stack has two commits of its own.
+    """
+    remote = directory / "remote.git"
+    work_tree = directory / "work"
+    sh.git.init("--bare", "--initial-branch", DEFAULT_BRANCH, str(remote))
+    sh.git.init("--initial-branch", DEFAULT_BRANCH, str(work_tree))
+
+    git = sh.git.bake(
+        "-c",
+        "user.name=Benchmark",
+        "-c",
+        "user.email=benchmark@localhost",
+        _cwd=str(work_tree),
+    )
+    git.remote.add("origin", str(remote))
+
+    commit_file(git, work_tree, "README.md", "Benchmark")
+    for level in range(1, stack_depth + 1):
+        git.switch("-c", stack_branch(level))
+        commit_file(git, work_tree, f"level-{level}.txt", "First")
+        commit_file(git, work_tree, f"level-{level}.txt", "Second")
+
+    branches = [stack_branch(level) for level in range(1, stack_depth + 1)]
+    git.push("origin", DEFAULT_BRANCH, *branches)
+    return git
+
+
+def commit_file(git: sh.Command, work_tree: Path, name: str, text: str) -> None:
+    """Write a file and commit it."""
+    (work_tree / name).write_text(f"{text}\n")
+    git.add(name)
+    git.commit("-m", f"{text}: {name}")
@@ -0,0 +1,112 @@
+"""
+Guard how fast `j stack` starts when it does not need GitHub.
+
+    python benchmarks/startup.py --output startup.json
+
+Exits with an error if the median run of any command exceeds the budget.
+The budget is counted on top of `--help` of an empty Typer app: Python,
+Typer & the `rich` help formatter Typer uses take most of the time, and how
+much depends on the machine far more than on this plugin.
+"""
+import argparse
+import subprocess  # noqa: S404
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from run import Benchmark, measure, summarize, write_results  # noqa: E402
+
+# Runs the plugin the way `jeeves` does, without `jeeves` own startup.
+ENTRY_POINT = "from jeeves_pr_stack import app; app(prog_name='stack')"
+
+# Empty Typer app; what every `j stack` command costs at the very least.
+BASELINE_ENTRY_POINT = (
+    "import typer; app = typer.Typer(); app.command()(lambda: None); app()"
+)
+
+COMMANDS = (
+    ("--help",),
+    ("push", "--help"),
+    ("daemon", "--help"),
+)
+
+# Seconds over the baseline: importing the plugin, and rendering help for
+# its commands & options, which grows with their number.
+DEFAULT_BUDGET = 0.15
+
+
+def construct_benchmark(
+    arguments: tuple[str, ...],
+    entry_point: str = ENTRY_POINT,
+    name: str = "stack",
+) -> Benchmark:
+    """Run `j stack` (or another entry point) in a fresh interpreter."""
+    return Benchmark(
+        name=" ".join((name, *arguments)),
+        run=lambda: subprocess.run(  # noqa: S603
+            [sys.executable, "-c", entry_point, *arguments],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        ),
+    )
+
+
+def main() -> None:
+    """Time startup of commands, fail if any of them is too slow."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=DEFAULT_BUDGET,
+        help="Maximum median duration of a command over the baseline, seconds.",
+    )
+    parser.add_argument("--output", type=Path, help="Where to write JSON.")
+    arguments = parser.parse_args()
+
+    baseline_benchmark = construct_benchmark(
+        ("--help",),
+        entry_point=BASELINE_ENTRY_POINT,
+        name="typer",
+    )
+    baseline = summarize(
+        "startup",
+        baseline_benchmark.name,
+        measure(baseline_benchmark, repeat=arguments.repeat),
+    )
+    print(  # noqa: WPS421
+        f"{baseline_benchmark.name:24} median "
+        f"{baseline['median'] * 1000:10.2f} ms",
+    )
+
+    results = [baseline]
+    for command in COMMANDS:
+        benchmark = construct_benchmark(command)
+        result = summarize(
+            "startup",
+            benchmark.name,
+            measure(benchmark, repeat=arguments.repeat),
+        )
+        results.append(result)
+        print(  # noqa: WPS421
+            f"{benchmark.name:24} median {result['median'] * 1000:10.2f} ms",
+        )
+
+    if arguments.output is not None:
+        write_results(arguments.output, results)
+
+    too_slow = [
+        result["benchmark"]
+        for result in results[1:]
+        if result["median"] - baseline["median"] > arguments.budget
+    ]
+    if too_slow:
+        sys.exit(
+            f"Slower than {arguments.budget * 1000:.0f} ms over "
+            f"{baseline_benchmark.name}: " + ", ".join(too_slow),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,27 @@
 import operator
-from typing import Annotated, Optional
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Optional
 
-import funcy
-from rich.console import Console
-from rich.prompt import Confirm, Prompt
-from rich.style import Style
-from sh import git
 from typer import Argument, Exit, Option, Typer
 
-from jeeves_pr_stack import github
-from jeeves_pr_stack.errors import NoPullRequestOnBranch
-from jeeves_pr_stack.format import (
-    pull_request_list_as_table,
-    pull_request_stack_as_table,
+from jeeves_pr_stack.models import (
+    WATCH_MAX_INTERVAL,
+    WATCH_MIN_INTERVAL,
+    CachePolicy,
+    MutationKind,
+    PRStackContext,
+    PullRequest,
+    PullRequestType,
+    QueuedMutation,
+    State,
 )
-from jeeves_pr_stack.logic import JeevesPullRequestStack
-from jeeves_pr_stack.models import PRStackContext, PullRequest, State
+
+if TYPE_CHECKING:
+    from jeeves_pr_stack.logic import JeevesPullRequestStack
+
+# Heavy modules, like `rich`, `sh` & the application logic, are imported by
+# the commands which use them so that `j --help` & alike start fast.
 
 app = Typer(
     help="Manage stacks of GitHub PRs.",
@@ -23,34 +29,87 @@ app = Typer(
     invoke_without_command=True,
 )
 
+daemon_app = Typer(
+    help="Keep PR stacks of this repository warm in background.",
+    name="daemon",
+)
+app.add_typer(daemon_app)
+
 
 @app.callback()
-def print_current_stack(context: PRStackContext):
+def print_current_stack(
+    context: PRStackContext,
+    cache: Annotated[
+        CachePolicy,
+        Option(help="How stale the cached PR snapshot is allowed to be."),
+    ] = CachePolicy.FRESH,
+    profile: Annotated[
+        bool,
+        Option(help="Print where the time went, save a Chrome trace."),
+    ] = False,
+    trace_file: Annotated[
+        Optional[Path],
+        Option(help="Where to save the trace; under `.git/` by default."),
+    ] = None,
+):
     """Print current PR stack."""
-    application = JeevesPullRequestStack()
-    stack = application.list_stack()
+    state = State(
+        construct_application=_construct_application,
+        cache_policy=cache,
+    )
+    context.obj = state
 
-    current_pull_request: PullRequest | None
-    try:
-        [current_pull_request] = [pr for pr in stack if pr.is_current]
-    except ValueError:
-        current_pull_request = None
+    if profile:
+        from jeeves_pr_stack.tracing import tracer  # noqa: WPS433
+
+        tracer.is_enabled = True
+        context.call_on_close(
+            lambda: _print_profile(
+                trace_file or state.application.state_directory / "trace.json",
+            ),
+        )
+
+    if context.invoked_subcommand is None:
+        _replay_mutations(state)
+        _print_stack(state)
 
-    context.obj = State(
-        current_branch=application.starting_branch,
-        stack=stack,
-        gh=application.gh,
-        current_pull_request=current_pull_request,
+
+def _construct_application(
+    cache_policy: CachePolicy,
+) -> "JeevesPullRequestStack":
+    from jeeves_pr_stack.logic import JeevesPullRequestStack  # noqa: WPS433
+
+    return JeevesPullRequestStack(cache_policy=cache_policy)
+
+
+def _print_stack(state: State) -> None:
+    from rich.console import Console  # noqa: WPS433
+    from rich.style import Style  # noqa: WPS433
+
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        format_staleness,
+        pull_request_stack_as_table,
     )
 
     console = Console()
-    default_branch = github.retrieve_default_branch()
+    served_stack = state.served_stack
+    stack = served_stack.stack
+    if served_stack.stale_since is not None:
+        console.print(
+            format_staleness(
+                served_stack.stale_since,
+                is_unreachable=served_stack.is_unreachable,
+            ),
+        )
+
     if stack:
         console.print(
             pull_request_stack_as_table(
                 stack,
-                default_branch=default_branch,
-                current_branch=application.starting_branch,
+                default_branch=state.default_branch,
+                current_branch=state.current_branch,
+                branch_states=state.application.collect_branch_states(stack),
+                failed_checks=served_stack.failed_checks,
             ),
         )
         return
@@ -67,49 +126,298 @@ def print_current_stack(context: PRStackContext):
     console.print("Get more help with [code]j stack --help[/code].")
 
 
+def _replay_mutations(state: State) -> None:
+    if state.cache_policy == CachePolicy.OFFLINE:
+        return
+
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack.errors import GitHubUnreachable  # noqa: WPS433
+
+    console = Console()
+    try:
+        for replayed in state.application.replay_mutations():
+            if replayed.blocker is None:
+                console.print(f"Replayed: {replayed.mutation}", style="green")
+            else:
+                console.print(
+                    f"Dropped: {replayed.mutation}, {replayed.blocker}.",
+                    style="red",
+                )
+    except GitHubUnreachable:
+        queued_count = len(state.application.outbox.read())
+        console.print(
+            f"GitHub is still out of reach; {queued_count} queued "
+            "mutation(s) will be replayed later.",
+            style="yellow",
+        )
+
+
+def _queue_mutation(state: State, mutation: QueuedMutation) -> None:
+    from rich.console import Console  # noqa: WPS433
+
+    state.application.queue_mutation(mutation)
+    Console().print(
+        f"Queued: {mutation}. It will be replayed by [code]j stack[/code] "
+        "or [code]j stack replay[/code] once GitHub is reachable.",
+        style="yellow",
+    )
+
+
+def _print_profile(trace_file: Path) -> None:
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack.format import spans_as_table  # noqa: WPS433
+    from jeeves_pr_stack.tracing import tracer  # noqa: WPS433
+
+    trace_file.parent.mkdir(parents=True, exist_ok=True)
+    tracer.export_chrome_trace(trace_file)
+
+    console = Console(stderr=True)
+    console.print(spans_as_table(tracer.spans))
+    console.print(
+        f"Trace saved to {trace_file}, open it at https://ui.perfetto.dev",
+    )
+
+
+@app.command(name="all")
+def print_all_stacks(context: PRStackContext):
+    """Print every PR stack in the repository."""
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        pull_request_stack_as_table,
+    )
+
+    stacks = context.obj.application.list_stacks()
+
+    console = Console()
+    for root in sorted(
+        stacks,
+        key=lambda branch: (branch != context.obj.default_branch, branch),
+    ):
+        console.rule(root)
+        console.print(
+            pull_request_stack_as_table(
+                stacks[root],
+                default_branch=context.obj.default_branch,
+                current_branch=context.obj.current_branch,
+            ),
+        )
+
+
+@app.command()
+def dashboard(
+    context: PRStackContext,
+    repositories: Annotated[
+        list[str],
+        Argument(help="Local checkouts or `[HOST/]OWNER/REPO` names."),
+    ],
+):
+    """Print your stacks across several repositories, queried at once."""
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        pull_request_stack_as_table,
+    )
+    from jeeves_pr_stack.logic import collect_dashboard  # noqa: WPS433
+
+    console = Console()
+    for repository_stacks in collect_dashboard(
+        repositories,
+        cache_policy=context.obj.cache_policy,
+    ):
+        console.rule(repository_stacks.repository)
+
+        if repository_stacks.error is not None:
+            console.print(repository_stacks.error, style="red")
+            continue
+
+        if not repository_stacks.stacks:
+            console.print("∅ No stacks of yours.\n")
+            continue
+
+        for root in sorted(
+            repository_stacks.stacks,
+            key=lambda branch: (
+                branch != repository_stacks.default_branch,
+                branch,
+            ),
+        ):
+            console.print(
+                pull_request_stack_as_table(
+                    repository_stacks.stacks[root],
+                    default_branch=repository_stacks.default_branch,
+                    current_branch=repository_stacks.current_branch,
+                ),
+            )
+
+
 @app.command()
-def pop(context: PRStackContext):  # noqa: WPS213
-    """Merge the bottom-most PR of current stack to the main branch."""
+def watch(
+    context: PRStackContext,
+    interval: Annotated[
+        float,
+        Option(help="Seconds between polls while the stack is changing."),
+    ] = WATCH_MIN_INTERVAL,
+):
+    """Watch current stack, redrawing it whenever a PR changes."""
+    from rich.console import Group  # noqa: WPS433
+    from rich.live import Live  # noqa: WPS433
+    from rich.text import Text  # noqa: WPS433
+
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        pull_request_stack_as_table,
+    )
+
+    application = context.obj.application
+    if application.cache_policy == CachePolicy.OFFLINE:
+        raise ValueError("Cannot watch the stack offline.")
+
+    stack_states = application.watch_stack(
+        min_interval=interval,
+        max_interval=max(interval, WATCH_MAX_INTERVAL),
+    )
+
+    with Live(auto_refresh=False) as live:
+        try:
+            for stack_state in stack_states:
+                renderables = [
+                    pull_request_stack_as_table(
+                        stack_state.stack,
+                        default_branch=context.obj.default_branch,
+                        current_branch=context.obj.current_branch,
+                        branch_states=stack_state.branch_states,
+                    ),
+                ]
+                if stack_state.error is not None:
+                    renderables.append(
+                        Text(
+                            f"Polling failed, retrying: {stack_state.error}",
+                            style="red",
+                        ),
+                    )
+
+                live.update(Group(*renderables), refresh=True)
+        except KeyboardInterrupt:
+            return
+
+
+@app.command()
+def pop(  # noqa: WPS213
+    context: PRStackContext,
+    count: Annotated[
+        int,
+        Option(
+            help="How many PRs to merge, from the bottom of the stack up.",
+            min=1,
+        ),
+    ] = 1,
+    merge_all: Annotated[
+        bool,
+        Option("--all", help="Merge every PR of the stack."),
+    ] = False,
+):
+    """Merge the bottom-most PRs of current stack to the main branch."""
+    import funcy  # noqa: WPS433
+    from rich.console import Console  # noqa: WPS433
+    from rich.prompt import Confirm  # noqa: WPS433
+
+    context.obj.is_mutating = True
+    _print_stack(context.obj)
+
     if not context.obj.stack:
         raise ValueError("Nothing to merge, current stack is empty.")
 
-    top_pr, *remaining_prs = context.obj.stack
+    top_pr = funcy.first(context.obj.stack)
 
-    default_branch = github.retrieve_default_branch()
+    default_branch = context.obj.default_branch
     console = Console()
     if top_pr.base_branch != default_branch:
         raise ValueError("Base branch of the PR ≠ default branch of the repo.")
 
-    dependant_pr = None
-    if remaining_prs:
-        dependant_pr = funcy.first(remaining_prs)
+    if merge_all:
+        count = len(context.obj.stack)
+
+    pull_requests_to_merge = context.obj.stack[:count]
+    dependant_pr = funcy.first(context.obj.stack[count:])
 
-    console.print("PR to merge: ", top_pr)
+    console.print("PRs to merge: ")
+    for pr in pull_requests_to_merge:
+        console.print(f"  {pr}")
     console.print("Dependant PR: ", dependant_pr)
 
     if not Confirm.ask("Do you confirm?", default=True):
         console.print("Aborted.", style="red")
         raise Exit(1)
 
-    if dependant_pr is not None:
-        console.print(f"Changing base of {dependant_pr} to {default_branch}")
-        github.update_pr_base(context.obj.gh, dependant_pr.number, default_branch)
+    if context.obj.application.is_offline:
+        _queue_mutation(
+            context.obj,
+            QueuedMutation(
+                kind=MutationKind.POP,
+                branch=context.obj.current_branch,
+                queued_at=time.time(),
+                pull_request_numbers=[
+                    pr.number for pr in pull_requests_to_merge
+                ],
+            ),
+        )
+        return
 
-    console.print(f"Merging {top_pr}...")
-    context.obj.gh.pr.merge("--merge", top_pr.number)
+    for step in context.obj.application.pop(
+        context.obj.stack,
+        count=count,
+        default_branch=default_branch,
+    ):
+        if step.blocker is not None:
+            console.print(
+                f"Stopped: {step.pull_request} {step.blocker}.",
+                style="red",
+            )
+            raise Exit(1)
+
+        console.print(f"Merged {step.pull_request}", style="green")
 
-    console.print(f"Deleting branch: {top_pr.branch}")
-    git.push.origin("--delete", top_pr.branch)
     console.print("OK.")
 
 
 @app.command()
-def comment():
+def comment(context: PRStackContext):
     """Comment on each PR of current stack with a navigation table."""
-    raise NotImplementedError()
+    from rich.console import Console  # noqa: WPS433
+    from rich.text import Text  # noqa: WPS433
+
+    from jeeves_pr_stack.models import CommentAction  # noqa: WPS433
+
+    context.obj.is_mutating = True
+    _print_stack(context.obj)
+
+    if not context.obj.stack:
+        raise ValueError("Nothing to comment on, current stack is empty.")
+
+    console = Console()
+    for upsert in context.obj.application.comment(context.obj.stack):
+        style = {
+            CommentAction.CREATED: "green",
+            CommentAction.UPDATED: "yellow",
+            CommentAction.UNCHANGED: "bright_black",
+        }[upsert.action]
+        console.print(
+            f"{upsert.pull_request} ",
+            Text(upsert.action.value, style=style),
+        )
 
 
 def _ask_for_pull_request_number(pull_requests: list[PullRequest]) -> int:
+    import funcy  # noqa: WPS433
+    from rich.console import Console  # noqa: WPS433
+    from rich.prompt import Prompt  # noqa: WPS433
+
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        pull_request_list_as_table,
+    )
+
     Console().print(pull_request_list_as_table(pull_requests))
 
     choices = [str(pr.number) for pr in pull_requests]
@@ -124,7 +432,9 @@ def _ask_for_pull_request_number(pull_requests: list[PullRequest]) -> int:
     )
 
 
-def filter_appendable(pull_requests: list[PullRequest]) -> list[PullRequest]:
+def filter_appendable(
+    pull_requests: list[PullRequestType],
+) -> list[PullRequestType]:
     """Determine which PRs we can direct a new PR to."""
     directed_to = {pr.base_branch: pr.branch for pr in pull_requests}
 
@@ -137,6 +447,7 @@ def filter_appendable(pull_requests: list[PullRequest]) -> list[PullRequest]:
 
 @app.command()
 def push(
+    context: PRStackContext,
     author: Annotated[
         str,
         Option(help="Author of the PRs to choose from."),
@@ -144,12 +455,25 @@ def push(
     pull_request_id: Annotated[Optional[int], Argument()] = None,
 ):
     """Direct current branch/PR to an existing PR."""
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack.errors import NoCachedSnapshot  # noqa: WPS433
+
     console = Console()
 
-    application = JeevesPullRequestStack()
+    application = context.obj.application
+
+    try:
+        pull_request_refs = application.list_pull_request_refs(author=author)
+    except NoCachedSnapshot as err:
+        if application.cache.unreachable is None:
+            raise
+
+        # Offline, but the PRs were never listed while online.
+        raise application.cache.unreachable from err
 
-    pull_requests_to_append = filter_appendable(
-        application.list_pull_requests(author=author),
+    pull_requests_to_append = application.retrieve_pull_requests(
+        filter_appendable(pull_request_refs),
     )
     if not pull_requests_to_append:
         raise ValueError("No PRs found which this branch could refer to.")
@@ -163,68 +487,253 @@ def push(
         pull_request_id
     ]
 
+    if application.is_offline:
+        _queue_mutation(
+            context.obj,
+            QueuedMutation(
+                kind=MutationKind.PUSH,
+                branch=application.starting_branch,
+                queued_at=time.time(),
+                base_branch=base_pull_request.branch,
+            ),
+        )
+        return
+
     # FIXME: Handle update of existing PR instead of creating a new one
     application.gh.pr.create(
         base=base_pull_request.branch,
         assignee="@me",
         _fg=True,
     )
+    application.refresh_served_stacks()
+
+
+@app.command()
+def replay(context: PRStackContext):
+    """Apply `pop` & `push` queued while GitHub was out of reach."""
+    from rich.console import Console  # noqa: WPS433
+
+    if not context.obj.application.outbox.read():
+        Console().print("Nothing is queued.")
+        return
+
+    if context.obj.cache_policy == CachePolicy.OFFLINE:
+        raise ValueError("Cannot replay queued mutations offline.")
+
+    _replay_mutations(context.obj)
 
 
 @app.command()
-def rebase(context: PRStackContext):
+def rebase(
+    context: PRStackContext,
+    dry_run: Annotated[
+        bool,
+        Option(help="Only predict conflicts, do not rebase anything."),
+    ] = False,
+):
     """Rebase each PR in the stack upon its base."""
-    application = JeevesPullRequestStack()
+    from rich.console import Console  # noqa: WPS433
+    from rich.prompt import Confirm  # noqa: WPS433
+
+    from jeeves_pr_stack.errors import OutdatedGit  # noqa: WPS433
+    from jeeves_pr_stack.format import (  # noqa: WPS433
+        predicted_conflicts_as_table,
+    )
+
+    context.obj.is_mutating = True
+    application = context.obj.application
 
     console = Console()
-    for is_not_first, pr in enumerate(application.rebase()):
-        if is_not_first:
+    try:
+        conflicts = application.predict_rebase_conflicts()
+    except OutdatedGit as err:
+        if dry_run:
+            raise
+
+        console.print(f"Skipping conflict prediction: {err}", style="yellow")
+        conflicts = []
+
+    if conflicts:
+        console.print(predicted_conflicts_as_table(conflicts))
+
+    if dry_run:
+        if not conflicts:
+            console.print("✔ Stack 🥞 would rebase cleanly.", style="green")
+        return
+
+    if conflicts and not Confirm.ask("Rebase anyway?", default=False):
+        console.print("Aborted.", style="red")
+        raise Exit(1)
+
+    is_in_progress = False
+    for step in application.rebase():
+        if is_in_progress:
             console.print("OK", style="green")
 
+        pr = step.pull_request
         console.print(
             f"#{pr.number} {pr.title}… ",
             end="",
         )
 
-    console.print("OK", style="green")
+        is_in_progress = not step.is_up_to_date
+        if step.is_up_to_date:
+            console.print("up to date, skipped", style="bright_black")
+
+    if is_in_progress:
+        console.print("OK", style="green")
+
     console.print()
     console.print("✔ Stack 🥞 rebased.", style="green")
 
 
 @app.command()
-def split(context: PRStackContext):  # noqa: WPS210
-    """Split current PR by commit."""
-    application = JeevesPullRequestStack()
+def split(  # noqa: WPS210, WPS231
+    context: PRStackContext,
+    split_commit_numbers: Annotated[
+        Optional[list[int]],
+        Option(
+            "--at",
+            help="Commit to end a new PR at, by number; repeat to split more.",
+        ),
+    ] = None,
+    branch_names: Annotated[
+        Optional[list[str]],
+        Option(
+            "--branch",
+            help="Name of the new branch for each `--at`, in the same order.",
+        ),
+    ] = None,
+):
+    """Split current PR by commits into a chain of PRs."""
+    from rich.console import Console  # noqa: WPS433
+    from rich.prompt import Prompt  # noqa: WPS433
 
-    console = Console()
+    from jeeves_pr_stack.errors import NoPullRequestOnBranch  # noqa: WPS433
+    from jeeves_pr_stack.models import SplitPoint  # noqa: WPS433
 
-    commits = application.list_commits()
-    enumerated_commits = list(enumerate(commits, start=1))
+    context.obj.is_mutating = True
+    _print_stack(context.obj)
+
+    application = context.obj.application
+
+    console = Console()
 
     original_pull_request = context.obj.current_pull_request
     if original_pull_request is None:
         raise NoPullRequestOnBranch(branch=context.obj.current_branch)
 
-    console.print("Commits:")
-    for commit_number, commit in enumerated_commits:
-        console.print(f"#{commit_number} {commit.title}")
+    commits = application.list_commits(original_pull_request)
+    enumerated_commits = list(enumerate(commits, start=1))
+
+    if not split_commit_numbers:
+        console.print("Commits:")
+        for commit_number, commit in enumerated_commits:
+            console.print(f"#{commit_number} {commit.title}")
 
-    choices = [str(number) for number, _commit in enumerated_commits]
-    splitting_commit_number = Prompt.ask(
-        prompt="Please choose the commit by which to split the PR",
-        default=funcy.first(choices),
-        choices=choices,
-        show_choices=True,
-    )
+        raw_commit_numbers = Prompt.ask(
+            prompt=(
+                "Please choose the commits by which to split the PR, "
+                "separated by commas"
+            ),
+            default="1",
+        )
+        split_commit_numbers = [
+            int(raw_number)
+            for raw_number in raw_commit_numbers.split(",")
+            if raw_number.strip()
+        ]
+
+    if len(branch_names or []) > len(split_commit_numbers):
+        raise ValueError("More `--branch` names than `--at` commits.")
 
-    splitting_commit = dict(enumerated_commits)[int(splitting_commit_number)]
+    branch_by_commit_number = dict(
+        zip(split_commit_numbers, branch_names or []),
+    )
+    split_commit_numbers = sorted(set(split_commit_numbers))
+    if not split_commit_numbers:
+        raise ValueError("No commits to split the PR by.")
+
+    if not all(0 < number < len(commits) for number in split_commit_numbers):
+        raise ValueError(
+            f"Commit numbers must be between 1 and {len(commits) - 1}; "
+            "the last commit stays in the original PR.",
+        )
 
     console.print("Current branch:")
     console.print(context.obj.current_branch)
-    new_branch_name = Prompt.ask(prompt="Enter the new branch name")
+    for commit_number in split_commit_numbers:
+        if commit_number not in branch_by_commit_number:
+            branch_by_commit_number[commit_number] = Prompt.ask(
+                prompt=f"Enter the new branch name, ending at #{commit_number}",
+            )
 
-    application.split(
-        splitting_commit=splitting_commit,
-        new_pr_branch_name=new_branch_name,
+    created_pull_requests = application.split(
         pull_request_to_split=original_pull_request,
+        split_points=[
+            SplitPoint(
+                commit=commits[commit_number - 1],
+                branch=branch_by_commit_number[commit_number],
+            )
+            for commit_number in split_commit_numbers
+        ],
+    )
+
+    for created_pull_request in created_pull_requests:
+        console.print(
+            f"{created_pull_request.branch} → "
+            f"{created_pull_request.base_branch}: {created_pull_request.url}",
+        )
+
+    console.print(
+        f"#{original_pull_request.number} is now directed to "
+        f"{created_pull_requests[-1].branch}.",
+        style="green",
     )
+
+
+@daemon_app.command(name="start")
+def start_daemon(
+    context: PRStackContext,
+    detach: Annotated[
+        bool,
+        Option(help="Run in background, detached from the terminal."),
+    ] = False,
+):
+    """Serve PR stacks over a Unix socket, refreshing them periodically."""
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack import daemon  # noqa: WPS433
+
+    application = context.obj.application
+    # Refuse before detaching, while the error can still be seen.
+    daemon.claim_socket(application.socket_path)
+
+    console = Console()
+    console.print(f"Listening on {application.socket_path}")
+
+    if detach and not daemon.detach():
+        return
+
+    application.serve()
+
+
+@daemon_app.command(name="stop")
+def stop_daemon(context: PRStackContext):
+    """Stop the daemon of this repository."""
+    from rich.console import Console  # noqa: WPS433
+
+    from jeeves_pr_stack import daemon  # noqa: WPS433
+
+    if daemon.request(context.obj.application.socket_path, {"method": "stop"}):
+        Console().print("Stopped.")
+    else:
+        Console().print("Daemon is not running.", style="yellow")
+
+
+@daemon_app.command(name="refresh")
+def refresh_daemon(context: PRStackContext):
+    """Make the daemon revalidate PR stacks now, e.g. from a git hook."""
+    from jeeves_pr_stack import daemon  # noqa: WPS433
+
+    daemon.request(context.obj.application.socket_path, {"method": "refresh"})
@@ -0,0 +1,63 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+# Key of a query: its first element is the kind of data it returns, which
+# mutations invalidate, e.g. `("details", pr_id)`.
+QueryKey = tuple[Hashable, ...]
+
+
+@dataclass
+class QueryBroker:
+    """
+    Results of gh & git queries, shared by everything one `j` run does.
+
+    Identical queries are executed once, even if issued concurrently; the
+    rest are served from memory until a mutation invalidates them.
+    """
+
+    _results: dict[QueryKey, Any] = field(default_factory=dict, init=False)
+    _locks: defaultdict[QueryKey, threading.Lock] = field(
+        default_factory=lambda: defaultdict(threading.Lock),
+        init=False,
+        repr=False,
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock,
+        init=False,
+        repr=False,
+    )
+
+    def fetch(self, key: QueryKey, query: Callable[[], Any]) -> Any:
+        """Run the query unless its result is already known."""
+        with self._lock:
+            key_lock = self._locks[key]
+
+        with key_lock:
+            try:
+                return self._results[key]
+            except KeyError:
+                query_result = query()
+                self._results[key] = query_result
+                return query_result
+
+    def has(self, key: QueryKey) -> bool:
+        """Check whether the query result is already known."""
+        return key in self._results
+
+    def get(self, key: QueryKey) -> Any:
+        """Return a known query result, or `None`."""
+        return self._results.get(key)
+
+    def store(self, key: QueryKey, query_result: Any) -> None:
+        """Remember a result obtained as part of a larger query."""
+        self._results[key] = query_result
+
+    def invalidate(self, kind: Hashable, *details: Hashable) -> None:
+        """Forget results of the given kind, optionally narrowed by key."""
+        prefix = (kind, *details)
+        with self._lock:
+            for key in list(self._results):
+                if key[:len(prefix)] == prefix:
+                    self._results.pop(key, None)
@@ -0,0 +1,238 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from jeeves_pr_stack.errors import GitHubUnreachable, NoCachedSnapshot
+from jeeves_pr_stack.models import CachePolicy, Revalidation, Snapshot
+
+Probe = Callable[[str | None], Revalidation]
+
+# Bump whenever the shape of cached payloads changes.
+FORMAT_VERSION = 3
+
+# Least recently used snapshots beyond this number are removed. Details of
+# every distinct set of PRs are cached separately, so they pile up.
+MAX_SNAPSHOTS = 200
+
+# Snapshot files are named after the SHA-256 digest of their key.
+SNAPSHOT_NAME_PATTERN = re.compile(r"[0-9a-f]{64}\.json")
+
+
+@dataclass
+class SnapshotCache:
+    """
+    On-disk cache of GitHub responses, revalidated with ETags.
+
+    `probe` asks GitHub whether anything changed since the given ETag was
+    issued; an unchanged repository costs one `304 Not Modified` response.
+    Once GitHub turns out to be out of reach, cached snapshots are served
+    as they are for the rest of the run.
+    """
+
+    directory: Path
+    probe: Probe
+
+    # Why GitHub could not be reached, if it could not.
+    unreachable: GitHubUnreachable | None = field(default=None, init=False)
+
+    # When the oldest snapshot served without revalidation was fetched.
+    stale_since: float | None = field(default=None, init=False)
+
+    _watermarks: dict[str | None, Revalidation] = field(
+        default_factory=dict,
+        init=False,
+        repr=False,
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock,
+        init=False,
+        repr=False,
+    )
+
+    def retrieve(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        policy: CachePolicy = CachePolicy.FRESH,
+        is_settled: Callable[[Any], bool] = lambda _payload: True,
+    ) -> Any:
+        """
+        Retrieve a payload by key, fetching it when the snapshot is stale.
+
+        `is_settled` tells whether the payload can be trusted when GitHub
+        reports no changes: for instance, running checks may finish without
+        touching the PR itself. If GitHub is out of reach, the snapshot is
+        served as it is.
+        """
+        snapshot = self.load(key)
+
+        if policy == CachePolicy.OFFLINE or self.unreachable is not None:
+            return self._serve_stale(key, snapshot)
+
+        is_revalidated_later = policy == CachePolicy.STALE_WHILE_REVALIDATE
+        if snapshot is not None and is_revalidated_later:
+            # Snapshots are stored atomically, so a revalidation still in
+            # flight need not delay exit.
+            threading.Thread(
+                target=self._refresh_in_background,
+                kwargs={
+                    "key": key,
+                    "fetch": fetch,
+                    "snapshot": snapshot,
+                    "is_settled": is_settled,
+                },
+                daemon=True,
+            ).start()
+            return snapshot.payload
+
+        try:
+            return self.refresh(
+                key=key,
+                fetch=fetch,
+                snapshot=snapshot,
+                is_settled=is_settled,
+            )
+        except GitHubUnreachable as err:
+            self.unreachable = err
+            if snapshot is None:
+                raise
+
+        return self._serve_stale(key, snapshot)
+
+    def mark_stale(self, fetched_at: float) -> None:
+        """Note that data fetched at that time is served as it is."""
+        with self._lock:
+            self.stale_since = min(self.stale_since or fetched_at, fetched_at)
+
+    def refresh(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        snapshot: Snapshot | None,
+        is_settled: Callable[[Any], bool],
+    ) -> Any:
+        """Revalidate the snapshot and fetch a new payload if needed."""
+        revalidation = self._revalidate(
+            snapshot.etag if snapshot is not None else None,
+        )
+
+        is_reusable = (
+            snapshot is not None
+            and not revalidation.is_modified
+            and is_settled(snapshot.payload)
+        )
+        if is_reusable:
+            # Modification time tells when GitHub last confirmed the snapshot
+            # and keeps it from being pruned while in use.
+            self._path_for(key).touch()
+            return snapshot.payload  # type: ignore
+
+        payload = fetch()
+        self.store(
+            key,
+            Snapshot(
+                etag=revalidation.etag,
+                fetched_at=time.time(),
+                payload=payload,
+            ),
+        )
+        return payload
+
+    def forget_watermarks(self) -> None:
+        """Revalidate snapshots again, for instance after a mutation."""
+        with self._lock:
+            self._watermarks.clear()
+            self.unreachable = None
+            self.stale_since = None
+
+    def load(self, key: str) -> Snapshot | None:
+        """Read a snapshot from disk."""
+        try:
+            raw_snapshot = json.loads(self._path_for(key).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return Snapshot(**raw_snapshot)
+
+    def store(self, key: str, snapshot: Snapshot) -> None:
+        """Write a snapshot to disk atomically."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, "w") as temporary_file:
+            json.dump(
+                {
+                    "etag": snapshot.etag,
+                    "fetched_at": snapshot.fetched_at,
+                    "payload": snapshot.payload,
+                },
+                temporary_file,
+            )
+
+        os.replace(temporary_path, self._path_for(key))
+        self._prune()
+
+    def _prune(self) -> None:
+        """Remove least recently used snapshots beyond `MAX_SNAPSHOTS`."""
+        used_at_by_path = {}
+        for path in self.directory.iterdir():
+            if SNAPSHOT_NAME_PATTERN.fullmatch(path.name):
+                # Another thread or process may have pruned it meanwhile.
+                with contextlib.suppress(FileNotFoundError):
+                    used_at_by_path[path] = path.stat().st_mtime
+
+        least_recently_used = sorted(
+            used_at_by_path,
+            key=used_at_by_path.__getitem__,
+        )[:-MAX_SNAPSHOTS]
+        for path in least_recently_used:
+            path.unlink(missing_ok=True)
+
+    def _serve_stale(self, key: str, snapshot: Snapshot | None) -> Any:
+        if snapshot is None:
+            raise NoCachedSnapshot(key=key)
+
+        self.mark_stale(self._path_for(key).stat().st_mtime)
+        return snapshot.payload
+
+    def _refresh_in_background(self, key: str, **kwargs) -> None:
+        try:
+            self.refresh(key=key, **kwargs)
+        except Exception:
+            # Nobody is there to report to; the snapshot served stays stale.
+            with contextlib.suppress(FileNotFoundError):
+                self.mark_stale(self._path_for(key).stat().st_mtime)
+
+    def _revalidate(self, etag: str | None) -> Revalidation:
+        """Probe GitHub once per ETag per process."""
+        with self._lock:
+            revalidation = self._watermarks.get(etag)
+            if revalidation is None and etag is None and self._watermarks:
+                # Nothing to revalidate: reuse any watermark we already know.
+                known_etag = next(iter(self._watermarks.values())).etag
+                revalidation = Revalidation(is_modified=True, etag=known_etag)
+
+            if revalidation is None:
+                revalidation = self.probe(etag)
+                self._watermarks[etag] = revalidation
+
+                # Snapshots taken at the new watermark are fresh, too.
+                if revalidation.etag is not None:
+                    self._watermarks.setdefault(
+                        revalidation.etag,
+                        Revalidation(is_modified=False, etag=revalidation.etag),
+                    )
+
+            return revalidation
+
+    def _path_for(self, key: str) -> Path:
+        digest = hashlib.sha256(f"{FORMAT_VERSION}|{key}".encode()).hexdigest()
+        return self.directory / f"{digest}.json"
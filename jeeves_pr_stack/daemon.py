@@ -0,0 +1,300 @@
+import contextlib
+import dataclasses
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from jeeves_pr_stack.errors import DaemonAlreadyRunning
+from jeeves_pr_stack.models import (
+    ChecksStatus,
+    FailedChecks,
+    PullRequest,
+    ServedStack,
+)
+
+SOCKET_FILE_NAME = "daemon.sock"
+
+# Longer paths do not fit into `sockaddr_un` on some platforms.
+MAX_SOCKET_PATH_LENGTH = 100
+
+# How often the daemon revalidates everything it has served.
+REFRESH_INTERVAL = 30
+
+# Views nobody asked for during this period are not refreshed anymore.
+VIEW_LIFETIME = 24 * 60 * 60
+
+# Clients give up on an unresponsive daemon quickly, and fetch by themselves.
+CLIENT_TIMEOUT = 0.5
+
+# Reads at most that much of a response.
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+def locate_socket(state_directory: Path) -> Path:
+    """Where the daemon of a repository listens."""
+    socket_path = state_directory / SOCKET_FILE_NAME
+    if len(str(socket_path)) <= MAX_SOCKET_PATH_LENGTH:
+        return socket_path
+
+    digest = hashlib.sha256(str(state_directory).encode()).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f"jeeves-pr-stack-{digest}.sock"
+
+
+def encode_pull_request(pull_request: PullRequest) -> dict:
+    """Convert a PR to JSON-compatible form."""
+    return {
+        **dataclasses.asdict(pull_request),
+        "checks_status": pull_request.checks_status.name,
+    }
+
+
+def decode_pull_request(raw_pull_request: dict) -> PullRequest:
+    """Restore a PR from its JSON-compatible form."""
+    return PullRequest(
+        **{
+            **raw_pull_request,
+            "checks_status": ChecksStatus[raw_pull_request["checks_status"]],
+        },
+    )
+
+
+def claim_socket(socket_path: Path) -> None:
+    """
+    Make sure no other daemon listens on the socket.
+
+    A socket nobody accepts connections on is left behind by a daemon which
+    did not exit cleanly, and is removed.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(CLIENT_TIMEOUT)
+        try:
+            connection.connect(str(socket_path))
+        except FileNotFoundError:
+            return
+        except ConnectionRefusedError:
+            socket_path.unlink(missing_ok=True)
+            return
+
+        # Even a daemon too busy to answer the `ping` still owns the socket.
+        with contextlib.suppress(OSError):
+            connection.sendall(json.dumps({"method": "ping"}).encode() + b"\n")
+            connection.shutdown(socket.SHUT_WR)
+            connection.recv(1)
+
+    raise DaemonAlreadyRunning(socket_path=str(socket_path))
+
+
+def request(socket_path: Path, message: dict) -> Any:
+    """Send one request to the daemon; `None` if it is not running."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(CLIENT_TIMEOUT)
+            connection.connect(str(socket_path))
+            connection.sendall(json.dumps(message).encode() + b"\n")
+            connection.shutdown(socket.SHUT_WR)
+
+            with connection.makefile("rb") as response_file:
+                raw_response = response_file.readline(MAX_MESSAGE_SIZE)
+    except OSError:
+        return None
+
+    if not raw_response:
+        return None
+
+    return json.loads(raw_response)
+
+
+def request_stack(socket_path: Path, branch: str) -> ServedStack | None:
+    """Ask the daemon for the stack of a branch."""
+    response = request(socket_path, {"method": "list_stack", "branch": branch})
+    if not response or "stack" not in response:
+        return None
+
+    return ServedStack(
+        stack=[decode_pull_request(raw_pr) for raw_pr in response["stack"]],
+        default_branch=response["default_branch"],
+        failed_checks={
+            branch: FailedChecks(**raw_failed_checks)
+            for branch, raw_failed_checks in response.get(
+                "failed_checks",
+                {},
+            ).items()
+        },
+        stale_since=response.get("stale_since"),
+        is_unreachable=response.get("is_unreachable", False),
+    )
+
+
+@dataclass
+class StackDaemon:
+    """
+    Keep PR stacks warm and serve them over a Unix domain socket.
+
+    Every view is computed on first request, then revalidated in background
+    every `refresh_interval` seconds and on `refresh` requests, which git
+    hooks & mutating commands send. Requests are newline terminated JSON
+    objects.
+    """
+
+    socket_path: Path
+
+    # Construct an application instance for the given branch.
+    construct_application: Callable[[str], Any]
+    refresh_interval: float = REFRESH_INTERVAL
+
+    # Serialized responses, by request.
+    _views: dict[str, dict] = field(default_factory=dict, init=False)
+    _requested_at: dict[str, float] = field(default_factory=dict, init=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock,
+        init=False,
+        repr=False,
+    )
+    _refresh_requested: threading.Event = field(
+        default_factory=threading.Event,
+        init=False,
+        repr=False,
+    )
+    _server: socketserver.ThreadingUnixStreamServer | None = field(
+        default=None,
+        init=False,
+        repr=False,
+    )
+
+    def serve_forever(self) -> None:
+        """Listen on the socket until asked to stop."""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        claim_socket(self.socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):  # noqa: WPS431
+            def handle(self) -> None:  # noqa: WPS110
+                raw_request = self.rfile.readline(MAX_MESSAGE_SIZE)
+                response = daemon.handle(json.loads(raw_request))
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        self._server = socketserver.ThreadingUnixStreamServer(
+            str(self.socket_path),
+            Handler,
+        )
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)  # noqa: WPS432
+
+        threading.Thread(target=self._refresh_periodically, daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+
+    def handle(self, message: dict) -> dict:
+        """Respond to one request."""
+        method = message.get("method")
+        if method == "ping":
+            return {"ok": True}
+
+        if method == "refresh":
+            # Whatever has been served may be outdated by now.
+            with self._lock:
+                self._views.clear()
+            self._refresh_requested.set()
+            return {"ok": True}
+
+        if method == "stop":
+            threading.Thread(
+                target=self._server.shutdown,  # type: ignore
+            ).start()
+            return {"ok": True}
+
+        if method not in {"list_stack", "list_pull_requests"}:
+            return {"error": f"Unknown method: {method}"}
+
+        key = json.dumps(message, sort_keys=True)
+        with self._lock:
+            self._requested_at[key] = time.monotonic()
+            view = self._views.get(key)
+
+        if view is None:
+            view = self._compute(message)
+            with self._lock:
+                self._views[key] = view
+
+        return view
+
+    def refresh(self) -> None:
+        """Revalidate every view requested recently."""
+        now = time.monotonic()
+        with self._lock:
+            for stale_key in [
+                key
+                for key, requested_at in self._requested_at.items()
+                if now - requested_at > VIEW_LIFETIME
+            ]:
+                self._requested_at.pop(stale_key)
+                self._views.pop(stale_key, None)
+
+            keys = list(self._requested_at)
+
+        for key in keys:
+            view = self._compute(json.loads(key))
+            with self._lock:
+                if key in self._requested_at:
+                    self._views[key] = view
+
+    def _refresh_periodically(self) -> None:
+        while True:  # noqa: WPS457
+            self._refresh_requested.wait(self.refresh_interval)
+            self._refresh_requested.clear()
+            try:
+                self.refresh()
+            except Exception:  # noqa: S112
+                # Network hiccups must not kill the daemon; try next time.
+                continue
+
+    def _compute(self, message: dict) -> dict:
+        application = self.construct_application(message["branch"])
+
+        if message["method"] == "list_pull_requests":
+            pull_requests = application.list_pull_requests(
+                author=message.get("author"),
+            )
+            return {
+                "pull_requests": [
+                    encode_pull_request(pr) for pr in pull_requests
+                ],
+            }
+
+        served_stack = application.retrieve_stack(may_be_served=False)
+        return {
+            **dataclasses.asdict(served_stack),
+            "stack": [encode_pull_request(pr) for pr in served_stack.stack],
+        }
+
+
+def detach() -> bool:
+    """
+    Fork a background process detached from the terminal.
+
+    Returns `True` in the background process, `False` in the original one.
+    """
+    if os.fork():
+        return False
+
+    os.setsid()
+    if os.fork():
+        os._exit(0)  # noqa: WPS437
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for descriptor in (0, 1, 2):
+        os.dup2(devnull, descriptor)
+
+    return True
@@ -29,22 +29,94 @@ class MergeConflicts(DocumentedError):
     """
     Merge conflicts detected.
 
-    Please resolve conflicts and issue
+    Please resolve conflicts, issue
 
-    `j stack rebase`
+    `git rebase --continue`
 
-    …once again.
+    …and then `j stack rebase` once again.
     """
 
 
-class GhPrEditDeprecationError(DocumentedError):
+@dataclass
+class OutdatedGit(DocumentedError):
+    """
+    Installed git is too old.
+
+    `{self.command}` requires git {self.required_version} or newer.
     """
-    Failed to update the PR base branch.
 
-    The gh CLI hit a GraphQL deprecation error (Projects classic).
-    This is a known issue: https://github.com/cli/cli/issues/11983
+    command: str
+    required_version: str
 
-    Please upgrade gh via your package manager
-    (e.g. brew upgrade gh, sudo apt install gh).
-    See https://github.com/cli/cli#installation
+
+@dataclass
+class GitHubApiError(DocumentedError):
     """
+    GitHub API request failed.
+
+    Status: {self.status}
+    Response: {self.message}
+    """
+
+    status: int
+    message: str
+
+
+@dataclass
+class GitHubUnreachable(DocumentedError):
+    """
+    GitHub is out of reach.
+
+    Reason: {self.reason}
+
+    `j stack` & `j stack push` work from the last cached PR snapshot while
+    offline; `j stack pop` & `j stack push` are queued until GitHub is
+    reachable again.
+    """
+
+    reason: str
+
+
+@dataclass
+class NoCachedSnapshot(DocumentedError):
+    """
+    No cached PR snapshot is available.
+
+    Cache key: {self.key}
+
+    Please run `j stack` with network access at least once
+    so that the snapshot could be stored under `.git/`.
+    """
+
+    key: str
+
+
+@dataclass
+class CyclicStack(DocumentedError):
+    """
+    Open PRs form a cycle.
+
+    Branches: {self.formatted_branches}
+
+    Please change the base branch of one of these PRs.
+    """
+
+    branches: list[str]
+
+    @property
+    def formatted_branches(self) -> str:
+        """Format the cycle for humans."""
+        return " → ".join(self.branches)
+
+
+@dataclass
+class DaemonAlreadyRunning(DocumentedError):
+    """
+    The daemon of this repository is already running.
+
+    Socket: {self.socket_path}
+
+    Run `j stack daemon stop` first to restart it.
+    """
+
+    socket_path: str
@@ -1,15 +1,44 @@
+import time
+
 from rich.style import Style
 from rich.table import Table
 from rich.text import Text
 
-from jeeves_pr_stack.models import ChecksStatus, PullRequest
+from jeeves_pr_stack.models import (
+    BranchState,
+    ChecksStatus,
+    FailedChecks,
+    PredictedConflict,
+    PullRequest,
+    Span,
+)
+from jeeves_pr_stack.tracing import traced
 
 bullet_point = '◉'
 vertical_line = '│'
 
+# Identifies navigation comments posted by `j stack comment`.
+navigation_comment_marker = '<!-- jeeves-pr-stack:navigation -->'
+
+# Failed checks named next to PR status; the rest are counted.
+max_failed_checks_shown = 3
+
+
+def format_staleness(stale_since: float, is_unreachable: bool) -> Text:
+    """Warn that PRs are shown as cached, not as GitHub has them now."""
+    fetched_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(stale_since))
+    reason = 'GitHub is out of reach' if is_unreachable else 'Offline'
+    return Text(
+        f'⚠ {reason}: PRs as of {fetched_at}, may be outdated.\n',
+        style='bold yellow',
+    )
+
 
-def format_status(pr: PullRequest) -> Text | str:
-    """Format PR status."""
+def format_status(
+    pr: PullRequest,
+    failed_checks: FailedChecks | None = None,
+) -> Text | str:
+    """Format PR status, naming failed checks if they are known."""
     if pr.is_draft:
         return Text(
             '📝 Draft',
@@ -17,10 +46,26 @@ def format_status(pr: PullRequest) -> Text | str:
         )
 
     if pr.checks_status == ChecksStatus.FAILURE:
-        return Text(
-            '❌ Checks failed',
-            style=Style(color='red'),
-        )
+        output = Text('❌ Checks failed', style=Style(color='red'))
+        if failed_checks is None or not failed_checks.count:
+            return output
+
+        shown_names = failed_checks.names[:max_failed_checks_shown]
+        if not shown_names:
+            # Failed checks are all beyond the first page of them.
+            output.append(f': {failed_checks.count}', style=Style(color='red'))
+            return output
+
+        output.append(': ' + ', '.join(shown_names), style=Style(color='red'))
+
+        hidden_count = failed_checks.count - len(shown_names)
+        if hidden_count > 0:
+            output.append(
+                f' +{hidden_count} more',
+                style=Style(color='bright_black'),
+            )
+
+        return output
 
     if pr.review_decision == 'REVIEW_REQUIRED':
         formatted_reviewers = ', '.join(pr.reviewers)
@@ -37,6 +82,46 @@ def format_status(pr: PullRequest) -> Text | str:
     )
 
 
+def format_branch_state(state: BranchState | None) -> Text:
+    """Format local state of a PR branch compactly."""
+    if state is None:
+        return Text('∅ no local branch', style=Style(color='bright_black'))
+
+    output = Text(f'{state.tip} ', style=Style(color='bright_black'))
+
+    upstream = state.upstream_divergence
+    if state.upstream is None:
+        output.append('no upstream', style=Style(color='bright_black'))
+    elif upstream is None:
+        output.append('upstream gone', style=Style(color='red'))
+    elif upstream.ahead and upstream.behind:
+        output.append(
+            f'⇡{upstream.ahead}⇣{upstream.behind} diverged',
+            style=Style(color='red', bold=True),
+        )
+    elif upstream.ahead:
+        output.append(
+            f'⇡{upstream.ahead} unpushed',
+            style=Style(color='yellow'),
+        )
+    elif upstream.behind:
+        output.append(
+            f'⇣{upstream.behind} behind',
+            style=Style(color='yellow'),
+        )
+    else:
+        output.append('= synced', style=Style(color='green'))
+
+    base = state.base_divergence
+    if base is not None and base.behind:
+        output.append(
+            f' · base ⇣{base.behind}, needs rebase',
+            style=Style(color='yellow'),
+        )
+
+    return output
+
+
 def format_branch(name: str, is_default: bool, is_current: bool) -> Text:
     pointer = ' '
     if is_current:
@@ -55,23 +140,39 @@ def format_branch(name: str, is_default: bool, is_current: bool) -> Text:
     )
 
 
+@traced('render')
 def pull_request_stack_as_table(
     stack: list[PullRequest],
     current_branch: str,
     default_branch: str,
+    branch_states: dict[str, BranchState] | None = None,
+    failed_checks: dict[str, FailedChecks] | None = None,
 ):
+    """
+    Draw a stack from the top branch down to its root.
+
+    A PR not directed to the branch drawn right above it belongs to a fork;
+    it starts a new segment of the drawing. If `branch_states` are given,
+    local state of each PR branch is shown below its status. Failed checks
+    are named by PR branch.
+    """
     output = Text()
     stack = list(reversed(stack))
 
-    output.append(
-        format_branch(
-            name=stack[0].branch,
-            is_current=stack[0].branch == current_branch,
-            is_default=stack[0].branch == default_branch,
-        ),
-    )
-
+    base_branch = None
     for pull_request in stack:
+        if pull_request.branch != base_branch:
+            if base_branch is not None:
+                output.append('\n')
+
+            output.append(
+                format_branch(
+                    name=pull_request.branch,
+                    is_current=pull_request.branch == current_branch,
+                    is_default=pull_request.branch == default_branch,
+                ),
+            )
+
         output.append(f'\n    {vertical_line}\n')
         output.append(f'    {vertical_line}   ')
         output.append(f'{pull_request.number:>#5} ', style='bold magenta')
@@ -79,8 +180,22 @@ def pull_request_stack_as_table(
         output.append(f'\n')
 
         output.append(f'    {vertical_line}         ')
-        output.append(format_status(pull_request))
-        output.append(f'\n    {vertical_line}\n')
+        output.append(
+            format_status(
+                pull_request,
+                failed_checks=(failed_checks or {}).get(pull_request.branch),
+            ),
+        )
+        output.append('\n')
+
+        if branch_states is not None:
+            output.append(f'    {vertical_line}         ')
+            output.append(
+                format_branch_state(branch_states.get(pull_request.branch)),
+            )
+            output.append('\n')
+
+        output.append(f'    {vertical_line}\n')
 
         output.append('    🭭 \n')
 
@@ -91,10 +206,41 @@ def pull_request_stack_as_table(
                 is_default=pull_request.base_branch == default_branch,
             ),
         )
+        base_branch = pull_request.base_branch
 
     return output
 
 
+@traced('render')
+def pull_request_stack_as_markdown(
+    stack: list[PullRequest],
+    pull_request: PullRequest,
+) -> str:
+    """Render navigation comment for a PR, from the top of the stack down."""
+    rows = []
+    for stack_pull_request in reversed(stack):
+        is_this_pull_request = stack_pull_request.number == pull_request.number
+        pointer = '👉' if is_this_pull_request else ''
+        title = stack_pull_request.title.replace('|', '\\|')
+        rows.append(
+            f'| {pointer} | #{stack_pull_request.number} | {title} | '
+            f'`{stack_pull_request.branch}` → '  # noqa: WPS326
+            f'`{stack_pull_request.base_branch}` |',
+        )
+
+    return '\n'.join([
+        navigation_comment_marker,
+        '**PR Stack** 🥞',
+        '',
+        '| | PR | Title | Branch |',
+        '|-|----|-------|--------|',
+        *rows,
+        '',
+        '<sub>Maintained by `j stack comment`.</sub>',
+    ])
+
+
+@traced('render')
 def pull_request_list_as_table(stack: list[PullRequest]):
     table = Table(
         'Current',
@@ -136,3 +282,77 @@ def pull_request_list_as_table(stack: list[PullRequest]):
         )
 
     return table
+
+
+@traced('render')
+def predicted_conflicts_as_table(conflicts: list[PredictedConflict]):
+    table = Table(
+        'Number',
+        'PR',
+        'Conflicting files',
+        title='⚠ Rebase would run into conflicts',
+        title_style=Style(color='red', bold=True),
+        show_lines=False,
+        show_edge=False,
+        box=None,
+    )
+
+    for conflict in conflicts:
+        pr = conflict.pull_request
+        table.add_row(
+            str(pr.number),
+            Text(pr.title, style=Style(link=pr.url, bold=True)),
+            Text('\n'.join(conflict.paths), style=Style(color='red')),
+        )
+
+    return table
+
+
+def spans_as_table(spans: list[Span]):
+    """Summarize where the time went, slowest operations first."""
+    table = Table(
+        'Category',
+        'Operation',
+        'Calls',
+        'Total, ms',
+        'Max, ms',
+        'Received',
+        'Failed',
+        title='⏱ Profile',
+        show_edge=False,
+        box=None,
+    )
+
+    groups: dict[tuple[str, str], list[Span]] = {}
+    for span in spans:
+        groups.setdefault((span.category, span.name), []).append(span)
+
+    milliseconds = 1000
+    for (category, name), group in sorted(
+        groups.items(),
+        key=lambda item: -sum(span.duration for span in item[1]),
+    ):
+        failed_count = sum(
+            1
+            for span in group
+            if 'error' in span.details or span.details.get('exit_code')
+        )
+        table.add_row(
+            category,
+            name,
+            str(len(group)),
+            f'{sum(span.duration for span in group) * milliseconds:.1f}',
+            f'{max(span.duration for span in group) * milliseconds:.1f}',
+            _format_size(sum(span.details.get('bytes', 0) for span in group)),
+            Text(str(failed_count), style='red') if failed_count else '',
+        )
+
+    return table
+
+
+def _format_size(size: int) -> str:
+    kilobyte = 1024
+    if size < kilobyte:
+        return f'{size} B'
+
+    return f'{size / kilobyte:.1f} KiB'
@@ -0,0 +1,191 @@
+import funcy
+import sh
+
+from jeeves_pr_stack.models import AheadBehind, BranchState, Commit, PullRequest
+
+# Separates fields of `git for-each-ref` output.
+FIELD_SEPARATOR = "%00"
+
+BRANCH_STATE_FIELDS = (
+    "%(objectname:short)",
+    "%(upstream:short)",
+    "%(upstream:track,nobracket)",
+)
+
+
+def count_ahead_behind(
+    git: sh.Command,
+    pairs: list[tuple[str, str]],
+) -> dict[tuple[str, str], AheadBehind]:
+    """Count commits each local branch is ahead of & behind the given base."""
+    _fields, counts = _for_each_branch(git, pairs=pairs)
+
+    return {
+        pair: ahead_behind
+        for pair, ahead_behind in counts.items()
+        if ahead_behind is not None
+    }
+
+
+def list_commits(git: sh.Command, base: str, head: str) -> list[Commit]:
+    """
+    List commits of `head` which `base` does not have, oldest first.
+
+    Raises `sh.ErrorReturnCode_128` if either revision is missing.
+    """
+    raw_log = git.log(
+        "--reverse",
+        "--format=%H%x00%s",
+        f"{base}..{head}",
+        # Otherwise `git log` output goes through a pager.
+        _tty_out=False,
+    )
+
+    return [
+        Commit(oid=oid, title=title)
+        for oid, title in (
+            line.split("\0", 1) for line in str(raw_log).splitlines()
+        )
+    ]
+
+
+def collect_branch_states(
+    git: sh.Command,
+    stack: list[PullRequest],
+    remote: str = "origin",
+) -> dict[str, BranchState]:
+    """
+    Describe local state of every branch of the stack.
+
+    Tip, upstream tracking, and divergence from both the upstream & the base
+    branch come from one `git for-each-ref` invocation.
+    """
+    stack_branches = {pr.branch for pr in stack}
+    pairs = [
+        (
+            pr.branch,
+            pr.base_branch
+            if pr.base_branch in stack_branches
+            else f"{remote}/{pr.base_branch}",
+        )
+        for pr in stack
+    ]
+
+    fields_by_branch, counts = _for_each_branch(
+        git,
+        pairs=pairs,
+        fields=BRANCH_STATE_FIELDS,
+    )
+
+    branch_states = {}
+    for branch, base in pairs:
+        fields = fields_by_branch.get(branch)
+        if fields is None:
+            continue
+
+        tip, upstream, tracking = fields
+        branch_states[branch] = BranchState(
+            tip=tip,
+            upstream=upstream or None,
+            upstream_divergence=_parse_tracking(tracking),
+            base_divergence=counts[branch, base],
+        )
+
+    return branch_states
+
+
+def _for_each_branch(
+    git: sh.Command,
+    pairs: list[tuple[str, str]],
+    fields: tuple[str, ...] = (),
+) -> tuple[
+    dict[str, list[str]],
+    dict[tuple[str, str], AheadBehind | None],
+]:
+    """
+    Read fields of local branches & their divergence from the given bases.
+
+    All of that is computed by one `git for-each-ref` with `%(ahead-behind)`
+    atoms (git 2.41+). Should that fail, either because git is older or some
+    base is missing, divergence is counted with `git rev-list` pair by pair.
+    """
+    if not pairs:
+        return {}, {}
+
+    branches = list(funcy.distinct(branch for branch, _base in pairs))
+    bases = list(funcy.distinct(base for _branch, base in pairs))
+    ahead_behind_fields = tuple(f"%(ahead-behind:{base})" for base in bases)
+
+    try:
+        rows = _read_refs(git, branches, fields + ahead_behind_fields)
+    except sh.ErrorReturnCode:
+        rows = _read_refs(git, branches, fields)
+        counts = {
+            (branch, base): _count_ahead_behind_of_pair(git, branch, base)
+            for branch, base in pairs
+        }
+        return rows, counts
+
+    fields_by_branch = {}
+    counts = {}
+    for branch, row in rows.items():
+        fields_by_branch[branch] = row[:len(fields)]
+
+        for base, raw_ahead_behind in zip(bases, row[len(fields):]):
+            ahead, behind = raw_ahead_behind.split()
+            counts[branch, base] = AheadBehind(
+                ahead=int(ahead),
+                behind=int(behind),
+            )
+
+    return fields_by_branch, {pair: counts.get(pair) for pair in pairs}
+
+
+def _read_refs(
+    git: sh.Command,
+    branches: list[str],
+    fields: tuple[str, ...],
+) -> dict[str, list[str]]:
+    raw_output = git(
+        "for-each-ref",
+        f"--format={FIELD_SEPARATOR.join(('%(refname)', *fields))}",
+        *(f"refs/heads/{branch}" for branch in branches),
+    )
+
+    rows = {}
+    for line in str(raw_output).splitlines():
+        refname, *row = line.split("\0")
+        rows[refname.removeprefix("refs/heads/")] = row
+
+    return rows
+
+
+def _count_ahead_behind_of_pair(
+    git: sh.Command,
+    branch: str,
+    base: str,
+) -> AheadBehind | None:
+    try:
+        behind, ahead = git(
+            "rev-list",
+            "--left-right",
+            "--count",
+            f"{base}...refs/heads/{branch}",
+        ).split()
+    except sh.ErrorReturnCode:
+        return None
+
+    return AheadBehind(ahead=int(ahead), behind=int(behind))
+
+
+def _parse_tracking(tracking: str) -> AheadBehind | None:
+    """Parse `ahead 1, behind 2`; `None` means upstream is gone or absent."""
+    if tracking == "gone":
+        return None
+
+    counts = dict.fromkeys(("ahead", "behind"), 0)
+    for chunk in filter(None, tracking.split(", ")):
+        direction, count = chunk.split()
+        counts[direction] = int(count)
+
+    return AheadBehind(**counts)
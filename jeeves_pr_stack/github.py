@@ -1,94 +1,287 @@
-import json
+import itertools
 import os
+import sys
+from typing import Iterator
 
-from networkx import DiGraph, edge_dfs
-from sh import Command, ErrorReturnCode, gh, git
+import funcy
+import sh
 
-from jeeves_pr_stack.errors import GhPrEditDeprecationError
-from jeeves_pr_stack.models import ChecksStatus, PullRequest, RawPullRequest
+from jeeves_pr_stack.errors import CyclicStack
+from jeeves_pr_stack.models import (
+    ChecksStatus,
+    FailedChecks,
+    NavigationComment,
+    PullRequestRef,
+    PullRequestType,
+    RawMergeState,
+    RawPullRequest,
+    RawPullRequestTopology,
+    RawRepositorySnapshot,
+    Revalidation,
+)
+from jeeves_pr_stack.stack_index import StackIndex
+from jeeves_pr_stack.transport import GitHubTransport
 
+# Every change to any PR (new commits, retargeting, closing, merging) bumps
+# its `updated_at`, which moves it to the top of this listing.
+PULL_REQUESTS_WATERMARK_ENDPOINT = (
+    "repos/{owner}/{repo}/pulls"
+    "?state=all&sort=updated&direction=desc&per_page=1"
+)
 
-def construct_checks_status(raw_pull_request: RawPullRequest) -> ChecksStatus:
-    """Analyze checks for PR and express their status as one value."""
-    raw_status_values = {
-        conclusion
-        for check in raw_pull_request["statusCheckRollup"]
-        if (conclusion := check.get("conclusion"))
+PULL_REQUEST_TOPOLOGY = """
+fragment PullRequestTopology on PullRequest {
+  number
+  id
+  headRefName
+  baseRefName
+  isCrossRepository
+  author { login }
+}
+"""
+
+PULL_REQUEST_FIELDS = """
+fragment PullRequestFields on PullRequest {
+  number
+  baseRefName
+  headRefName
+  id
+  author { login }
+  isDraft
+  mergeable
+  title
+  url
+  reviewDecision
+  reviewRequests(first: 100) {
+    nodes {
+      requestedReviewer {
+        ... on User { login }
+        ... on Mannequin { login }
+        ... on Team { name }
+      }
     }
+  }
+  commits(last: 1) {
+    nodes {
+      commit {
+        statusCheckRollup {
+          contexts {
+            checkRunCountsByState { state count }
+            statusContextCountsByState { state count }
+          }
+        }
+      }
+    }
+  }
+}
+"""
 
-    # This one is not informative
-    raw_status_values.discard("SUCCESS")
+PULL_REQUESTS_PAGE_QUERY = """
+query PullRequestsPage(
+  $owner: String!,
+  $name: String!,
+  $branch: String!,
+  $after: String,
+  $isFirstPage: Boolean!
+) {
+  viewer { login }
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef { name }
+    pullRequests(
+      states: OPEN,
+      first: 100,
+      after: $after,
+      orderBy: {field: UPDATED_AT, direction: DESC}
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...PullRequestTopology }
+    }
+    currentPullRequest: pullRequests(
+      states: OPEN,
+      headRefName: $branch,
+      first: 1
+    ) @include(if: $isFirstPage) {
+      nodes { ...PullRequestTopology }
+    }
+    childPullRequests: pullRequests(
+      states: OPEN,
+      baseRefName: $branch,
+      first: 100
+    ) @include(if: $isFirstPage) {
+      nodes { ...PullRequestTopology }
+    }
+  }
+}
+""" + PULL_REQUEST_TOPOLOGY
 
-    # No idea what to do with this one
-    raw_status_values.discard("NEUTRAL")
+PULL_REQUEST_DETAILS_QUERY = """
+query PullRequestDetails($ids: [ID!]!) {
+  nodes(ids: $ids) { ...PullRequestFields }
+}
+""" + PULL_REQUEST_FIELDS
 
-    # We do not care
-    raw_status_values.discard("SKIPPED")
-    raw_status_values.discard("CANCELLED")
+NAVIGATION_COMMENTS_PAGE = """
+fragment NavigationCommentsPage on IssueCommentConnection {
+  pageInfo { hasPreviousPage startCursor }
+  nodes { databaseId body viewerDidAuthor }
+}
+"""
 
-    try:
-        raw_status_values.remove("")
-    except KeyError:
-        pass  # noqa: WPS420
-    else:
+NAVIGATION_COMMENTS_QUERY = """
+query NavigationComments($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on PullRequest {
+      id
+      comments(last: 100) { ...NavigationCommentsPage }
+    }
+  }
+}
+""" + NAVIGATION_COMMENTS_PAGE
+
+EARLIER_COMMENTS_QUERY = """
+query EarlierComments($id: ID!, $before: String!) {
+  node(id: $id) {
+    ... on PullRequest {
+      comments(last: 100, before: $before) { ...NavigationCommentsPage }
+    }
+  }
+}
+""" + NAVIGATION_COMMENTS_PAGE
+
+MERGE_STATE_QUERY = """
+query MergeState($id: ID!) {
+  node(id: $id) {
+    ... on PullRequest {
+      mergeable
+      mergeStateStatus
+      commits(last: 1) {
+        nodes { commit { statusCheckRollup { state } } }
+      }
+    }
+  }
+}
+"""
+
+FAILED_CHECKS_QUERY = """
+query FailedChecks($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on PullRequest {
+      id
+      commits(last: 1) {
+        nodes {
+          commit {
+            statusCheckRollup {
+              contexts(first: 100) {
+                checkRunCountsByState { state count }
+                statusContextCountsByState { state count }
+                nodes {
+                  ... on CheckRun { name conclusion }
+                  ... on StatusContext { context state }
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Maximum number of IDs GitHub accepts in `nodes(ids: …)`.
+NODES_PER_QUERY = 100
+
+# Check run conclusions & commit status states, by what they mean for a PR.
+# In-progress check runs have no conclusion, hence the empty string.
+RUNNING_CHECK_STATES = frozenset((
+    "",
+    "EXPECTED",
+    "IN_PROGRESS",
+    "PENDING",
+    "QUEUED",
+    "REQUESTED",
+    "WAITING",
+))
+SUCCESSFUL_CHECK_STATES = frozenset((
+    "SUCCESS",
+    "COMPLETED",
+    # Not informative, or not our concern.
+    "NEUTRAL",
+    "SKIPPED",
+    "CANCELLED",
+    "STALE",
+))
+
+
+def construct_checks_status(raw_pull_request: RawPullRequest) -> ChecksStatus:
+    """Analyze checks for PR and express their status as one value."""
+    check_states = {
+        check_state
+        for check_state, count in raw_pull_request["checkCounts"].items()
+        if count
+    }
+
+    if check_states & RUNNING_CHECK_STATES:
         return ChecksStatus.RUNNING
 
-    try:
-        raw_status_values.remove("FAILURE")
-    except KeyError:
-        # No failures detected, we are fine
-        pass  # noqa: WPS420
-    else:
+    # `FAILURE`, `TIMED_OUT`, `ACTION_REQUIRED` & alike. States GitHub might
+    # introduce later are shown as failures too, to draw a look at them.
+    if check_states - SUCCESSFUL_CHECK_STATES:
         return ChecksStatus.FAILURE
 
-    if raw_status_values:
-        raise ValueError(f"Unknown check statuses: {raw_status_values}")
-
     return ChecksStatus.SUCCESS
 
 
-def construct_stack_for_branch(  # noqa: WPS210
+def is_failed_check_state(check_state: str) -> bool:
+    """Tell whether a check run conclusion or status state is a failure."""
+    return check_state not in RUNNING_CHECK_STATES | SUCCESSFUL_CHECK_STATES
+
+
+def construct_stack_for_branch(
     branch: str,
-    pull_requests: list[PullRequest],
-) -> list[PullRequest]:
+    pull_requests: list[PullRequestType],
+) -> list[PullRequestType]:
     """Construct sequence of PRs that covers the given branch."""
     pull_request_by_branch = {pr.branch: pr for pr in pull_requests}
+    stack_index = StackIndex.from_pull_requests(pull_requests)
 
-    graph = DiGraph(
-        incoming_graph_data=[
-            # PR is directed from its head branch → to its base branch.
-            (pr.branch, pr.base_branch)
-            for pr in pull_requests
-        ],
-    )
+    return [
+        pull_request_by_branch[head]
+        for head in stack_index.stack_for_branch(branch)
+    ]
 
-    successors = [
-        (source, destination)
-        for source, destination, _reverse in edge_dfs(  # noqa: WPS361
-            graph, source=branch, orientation="reverse"
+
+def construct_pull_request_refs(
+    raw_pull_requests: list[RawPullRequestTopology],
+) -> list[PullRequestRef]:
+    """
+    Convert raw PR topology into PR references.
+
+    PRs from forks are left out: their head branches are not branches of
+    this repository, and may be named like any of them, `main` included.
+    """
+    return [
+        PullRequestRef(
+            number=raw_pull_request["number"],
+            id=raw_pull_request["id"],
+            # Branch names repeat as bases of other PRs, authors repeat too.
+            branch=sys.intern(raw_pull_request["headRefName"]),
+            base_branch=sys.intern(raw_pull_request["baseRefName"]),
+            author=sys.intern(raw_pull_request["author"]["login"]),
         )
+        for raw_pull_request in raw_pull_requests
+        if not raw_pull_request["isCrossRepository"]
     ]
-    predecessors = list(reversed(list(edge_dfs(graph, source=branch))))
-    edges = predecessors + successors
-
-    return [pull_request_by_branch[branch] for branch, _base_branch in edges]
 
 
 def retrieve_current_branch() -> str:
     """Retrieve current git branch name."""
-    return git.branch("--show-current").strip()
-
-
-def _construct_gh_env() -> dict[str, str]:
-    return {
-        **os.environ,
-        "NO_COLOR": "1",
-    }
+    return sh.git.branch("--show-current").strip()
 
 
-def construct_gh_command() -> Command:
+def construct_gh_command() -> sh.Command:
     """Construct the GitHub CLI command."""
-    return gh.bake(
+    return sh.gh.bake(
         _long_sep=None,
         _tty_out=False,
         _env={
@@ -98,29 +291,453 @@ def construct_gh_command() -> Command:
     )
 
 
-def retrieve_default_branch() -> str:
-    """Get default branch of current repository."""
-    return json.loads(
-        gh.repo.view(
-            json="defaultBranchRef",
-            _env=_construct_gh_env(),
-            _tty_out=False,
-        ),
-    )["defaultBranchRef"]["name"]
+def _normalize_topology(raw_node: dict) -> RawPullRequestTopology:
+    return {
+        "number": raw_node["number"],
+        "id": raw_node["id"],
+        "headRefName": raw_node["headRefName"],
+        "baseRefName": raw_node["baseRefName"],
+        "isCrossRepository": raw_node["isCrossRepository"],
+        # Authors of PRs from deleted accounts are `null`.
+        "author": raw_node["author"] or {"login": ""},
+    }
+
+
+def _count_check_states(contexts: dict) -> dict[str, int]:
+    """Sum up check runs & commit statuses by their state."""
+    check_counts: dict[str, int] = {}
+    for state_count in itertools.chain(
+        contexts["checkRunCountsByState"],
+        contexts["statusContextCountsByState"],
+    ):
+        check_state = state_count["state"]
+        check_counts[check_state] = (
+            check_counts.get(check_state, 0) + state_count["count"]
+        )
+
+    return check_counts
+
+
+def _normalize_pull_request(raw_node: dict) -> RawPullRequest:
+    """Convert GraphQL PR node into the shape `gh pr list --json` uses."""
+    commit_nodes = raw_node["commits"]["nodes"]
+    rollup = (
+        commit_nodes[0]["commit"]["statusCheckRollup"]
+        if commit_nodes
+        else None
+    )
+
+    check_counts = _count_check_states(rollup["contexts"]) if rollup else {}
+
+    return {
+        "number": raw_node["number"],
+        "baseRefName": raw_node["baseRefName"],
+        "headRefName": raw_node["headRefName"],
+        "id": raw_node["id"],
+        "author": raw_node["author"] or {"login": ""},
+        "isDraft": raw_node["isDraft"],
+        "mergeable": raw_node["mergeable"],
+        "title": raw_node["title"],
+        "url": raw_node["url"],
+        "reviewDecision": raw_node["reviewDecision"] or "",
+        "reviewRequests": [
+            review_request["requestedReviewer"]
+            for review_request in raw_node["reviewRequests"]["nodes"]
+            if review_request["requestedReviewer"]
+        ],
+        "checkCounts": check_counts,
+    }
+
+
+def _iter_pull_request_pages(
+    transport: GitHubTransport,
+    branch: str,
+) -> Iterator[dict]:
+    """Lazily fetch open PRs page by page, most recently updated first."""
+    cursor = None
+    is_first_page = True
+
+    while True:
+        response = transport.graphql(
+            PULL_REQUESTS_PAGE_QUERY,
+            branch=branch,
+            after=cursor,
+            isFirstPage=is_first_page,
+        )
+        yield response
+
+        page_info = response["repository"]["pullRequests"]["pageInfo"]
+        if not page_info["hasNextPage"]:
+            return
+
+        cursor = page_info["endCursor"]
+        is_first_page = False
+
+
+def retrieve_child_pull_requests(
+    transport: GitHubTransport,
+    branches: list[str],
+) -> list[RawPullRequestTopology]:
+    """Fetch open PRs directed to any of `branches` in one round trip."""
+    variables = {
+        f"branch{index}": branch for index, branch in enumerate(branches)
+    }
+    declarations = "".join(
+        f", ${variable_name}: String!" for variable_name in variables
+    )
+    connections = "\n".join(
+        f"{variable_name}: pullRequests(states: OPEN, "
+        f"baseRefName: ${variable_name}, first: 100) "
+        "{ nodes { ...PullRequestTopology } }"
+        for variable_name in variables
+    )
+    query = (
+        "query ChildPullRequests($owner: String!, $name: String!"
+        f"{declarations}) "
+        f"{{ repository(owner: $owner, name: $name) {{ {connections} }} }}"
+        + PULL_REQUEST_TOPOLOGY
+    )
+
+    repository = transport.graphql(query, **variables)["repository"]
+    return [
+        _normalize_topology(raw_node)
+        for connection in repository.values()
+        for raw_node in connection["nodes"]
+    ]
+
+
+def _construct_repository_snapshot(
+    first_page: dict,
+    pull_requests: dict[int, RawPullRequestTopology],
+    is_complete: bool,
+) -> RawRepositorySnapshot:
+    return {
+        "defaultBranch": first_page["repository"]["defaultBranchRef"]["name"],
+        "viewer": first_page["viewer"]["login"],
+        "pullRequests": list(pull_requests.values()),
+        "isComplete": is_complete,
+    }
+
+
+def retrieve_repository_snapshot(
+    transport: GitHubTransport,
+    branch: str,
+) -> RawRepositorySnapshot:
+    """Fetch default branch & topology of all open PRs, page by page."""
+    pages = _iter_pull_request_pages(transport, branch)
+    first_page = next(pages)
 
+    pull_requests = {
+        raw_node["number"]: _normalize_topology(raw_node)
+        for page in itertools.chain([first_page], pages)
+        for raw_node in page["repository"]["pullRequests"]["nodes"]
+    }
 
-def update_pr_base(gh_cmd, pr_number: int, base_branch: str) -> None:
-    """Update a PR's base branch. Raises GhPrEditDeprecationError on deprecation."""  # noqa: E501
+    return _construct_repository_snapshot(
+        first_page,
+        pull_requests,
+        is_complete=True,
+    )
+
+
+def _is_chain_resolved(
+    stack_index: StackIndex,
+    branch: str,
+    default_branch: str,
+) -> bool:
+    """Check if PRs from `branch` down to the default branch are all known."""
     try:
-        gh_cmd.pr.edit(pr_number, base=base_branch)
-    except ErrorReturnCode as err:
-        stderr_raw = err.stderr
-        if isinstance(stderr_raw, bytes):
-            stderr = stderr_raw.decode()
-        else:
-            stderr = str(stderr_raw)
-        projects_classic = "Projects (classic)" in stderr
-        project_cards = "repository.pullRequest.projectCards" in stderr
-        if projects_classic and project_cards:
-            raise GhPrEditDeprecationError() from err
-        raise
+        return stack_index.root_of(branch) == default_branch
+    except CyclicStack:
+        # Nothing else to look for.
+        return True
+
+
+def retrieve_stack_snapshot(  # noqa: WPS210, WPS231
+    transport: GitHubTransport,
+    branch: str,
+) -> RawRepositorySnapshot:
+    """
+    Fetch topology of open PRs until the stack of `branch` is known.
+
+    Pages stream in until the chain from `branch` down to the default branch
+    is complete; PRs stacked upon `branch` are looked up by base branch.
+    """
+    pages = _iter_pull_request_pages(transport, branch)
+    first_page = next(pages)
+    repository = first_page["repository"]
+    default_branch = repository["defaultBranchRef"]["name"]
+
+    pull_requests: dict[int, RawPullRequestTopology] = {}
+    stack_index = StackIndex()
+
+    def add(  # noqa: WPS430
+        raw_pull_requests: list[RawPullRequestTopology],
+    ) -> None:
+        for raw_pull_request in raw_pull_requests:
+            pull_requests[raw_pull_request["number"]] = raw_pull_request
+
+        stack_index.add(construct_pull_request_refs(raw_pull_requests))
+
+    current_pull_requests = [
+        _normalize_topology(raw_node)
+        for raw_node in repository["currentPullRequest"]["nodes"]
+    ]
+    child_pull_requests = [
+        _normalize_topology(raw_node)
+        for raw_node in repository["childPullRequests"]["nodes"]
+    ]
+    add(current_pull_requests)
+    add(child_pull_requests)
+
+    is_complete = False
+    for page in itertools.chain([first_page], pages):
+        add([
+            _normalize_topology(raw_node)
+            for raw_node in page["repository"]["pullRequests"]["nodes"]
+        ])
+
+        if branch == default_branch:
+            # Every open PR might belong to the stack of the default branch.
+            continue
+
+        if not current_pull_requests or _is_chain_resolved(
+            stack_index,
+            branch,
+            default_branch,
+        ):
+            break
+    else:
+        is_complete = True
+
+    if not is_complete:
+        visited = {branch}
+        frontier = {pr["headRefName"] for pr in child_pull_requests} - visited
+        while frontier:
+            visited |= frontier
+            grandchild_pull_requests = retrieve_child_pull_requests(
+                transport,
+                sorted(frontier),
+            )
+            add(grandchild_pull_requests)
+            frontier = {
+                pr["headRefName"] for pr in grandchild_pull_requests
+            } - visited
+
+    return _construct_repository_snapshot(
+        first_page,
+        pull_requests,
+        is_complete=is_complete,
+    )
+
+
+def retrieve_pull_request_details(
+    transport: GitHubTransport,
+    ids: list[str],
+) -> list[RawPullRequest]:
+    """Fetch statuses, checks & reviews for the given PRs by node ID."""
+    pull_requests: list[RawPullRequest] = []
+    for chunk in funcy.chunks(NODES_PER_QUERY, ids):
+        response = transport.graphql(PULL_REQUEST_DETAILS_QUERY, ids=chunk)
+        pull_requests.extend(
+            _normalize_pull_request(raw_node)
+            for raw_node in response["nodes"]
+            if raw_node is not None
+        )
+
+    return pull_requests
+
+
+def retrieve_failed_checks(
+    transport: GitHubTransport,
+    ids: list[str],
+) -> dict[str, FailedChecks]:
+    """
+    Find the failed checks of the given PRs, by PR node ID.
+
+    Only checks on the first page are named, but all of them are counted.
+    """
+    failed_checks = {}
+    for chunk in funcy.chunks(NODES_PER_QUERY, ids):
+        raw_nodes = transport.graphql(FAILED_CHECKS_QUERY, ids=chunk)["nodes"]
+        for raw_node in filter(None, raw_nodes):
+            commit_nodes = raw_node["commits"]["nodes"]
+            rollup = (
+                commit_nodes[0]["commit"]["statusCheckRollup"]
+                if commit_nodes
+                else None
+            )
+            failed_checks[raw_node["id"]] = _find_failed_checks(
+                rollup["contexts"] if rollup else None,
+            )
+
+    return failed_checks
+
+
+def _find_failed_checks(contexts: dict | None) -> FailedChecks:
+    """Name failed checks found on the page, count all of them."""
+    if contexts is None:
+        return FailedChecks(names=[], count=0)
+
+    failed_names = [
+        context.get("name") or context["context"]
+        for context in contexts["nodes"]
+        if is_failed_check_state(
+            context.get("conclusion") or context.get("state") or "",
+        )
+    ]
+    failed_count = sum(
+        count
+        for check_state, count in _count_check_states(contexts).items()
+        if is_failed_check_state(check_state)
+    )
+    return FailedChecks(names=failed_names, count=failed_count)
+
+
+def retrieve_navigation_comments(
+    transport: GitHubTransport,
+    ids: list[str],
+    marker: str,
+) -> dict[str, NavigationComment]:
+    """
+    Find our own comments starting with `marker` on the given PRs.
+
+    The latest 100 comments of every PR are fetched at once; earlier ones
+    only for PRs where the marker is not found among them.
+    """
+    navigation_comments = {}
+    for chunk in funcy.chunks(NODES_PER_QUERY, ids):
+        raw_nodes = transport.graphql(
+            NAVIGATION_COMMENTS_QUERY,
+            ids=chunk,
+        )["nodes"]
+        for raw_node in filter(None, raw_nodes):
+            navigation_comment = _find_navigation_comment(
+                transport,
+                pr_id=raw_node["id"],
+                raw_comments=raw_node["comments"],
+                marker=marker,
+            )
+            if navigation_comment is not None:
+                navigation_comments[raw_node["id"]] = navigation_comment
+
+    return navigation_comments
+
+
+def _find_navigation_comment(
+    transport: GitHubTransport,
+    pr_id: str,
+    raw_comments: dict,
+    marker: str,
+) -> NavigationComment | None:
+    """Page through comments of a PR from the latest back to the first."""
+    while True:
+        for raw_comment in reversed(raw_comments["nodes"]):
+            is_navigation_comment = raw_comment[
+                "viewerDidAuthor"
+            ] and raw_comment["body"].startswith(marker)
+
+            if is_navigation_comment:
+                return NavigationComment(
+                    id=raw_comment["databaseId"],
+                    body=raw_comment["body"],
+                )
+
+        page_info = raw_comments["pageInfo"]
+        if not page_info["hasPreviousPage"]:
+            return None
+
+        raw_comments = transport.graphql(
+            EARLIER_COMMENTS_QUERY,
+            id=pr_id,
+            before=page_info["startCursor"],
+        )["node"]["comments"]
+
+
+def create_comment(
+    transport: GitHubTransport,
+    pr_number: int,
+    body: str,
+) -> None:
+    """Post a new comment on a PR."""
+    transport.rest(
+        "POST",
+        f"repos/{{owner}}/{{repo}}/issues/{pr_number}/comments",
+        body={"body": body},
+    )
+
+
+def update_comment(
+    transport: GitHubTransport,
+    comment_id: int,
+    body: str,
+) -> None:
+    """Replace the text of a PR comment."""
+    transport.rest(
+        "PATCH",
+        f"repos/{{owner}}/{{repo}}/issues/comments/{comment_id}",
+        body={"body": body},
+    )
+
+
+def retrieve_merge_state(
+    transport: GitHubTransport,
+    pr_id: str,
+) -> RawMergeState:
+    """Ask GitHub whether a PR can be merged right now."""
+    raw_node = transport.graphql(MERGE_STATE_QUERY, id=pr_id)["node"]
+
+    commit_nodes = raw_node["commits"]["nodes"]
+    rollup = (
+        commit_nodes[0]["commit"]["statusCheckRollup"]
+        if commit_nodes
+        else None
+    )
+    return {
+        "mergeable": raw_node["mergeable"],
+        "mergeStateStatus": raw_node["mergeStateStatus"],
+        "checksState": rollup["state"] if rollup else "",
+    }
+
+
+def update_pr_base(
+    transport: GitHubTransport,
+    pr_number: int,
+    base_branch: str,
+) -> None:
+    """Update a PR's base branch."""
+    transport.rest(
+        "PATCH",
+        f"repos/{{owner}}/{{repo}}/pulls/{pr_number}",
+        body={"base": base_branch},
+    )
+
+
+def merge_pull_request(transport: GitHubTransport, pr_number: int) -> None:
+    """Merge a PR with a merge commit."""
+    transport.rest(
+        "PUT",
+        f"repos/{{owner}}/{{repo}}/pulls/{pr_number}/merge",
+        body={"merge_method": "merge"},
+    )
+
+
+def probe_pull_requests_watermark(
+    transport: GitHubTransport,
+    etag: str | None,
+) -> Revalidation:
+    """
+    Check whether any PR in the repo has changed since `etag` was issued.
+
+    `304 Not Modified` responses do not count against the API rate limit.
+    """
+    response = transport.rest(
+        "GET",
+        PULL_REQUESTS_WATERMARK_ENDPOINT,
+        headers={"If-None-Match": etag} if etag else None,
+    )
+
+    if response.status == 304:  # noqa: WPS432
+        return Revalidation(is_modified=False, etag=etag)
+
+    return Revalidation(is_modified=True, etag=response.headers.get("etag"))
@@ -1,32 +1,388 @@
-import json
+import functools
 import os
 import sys
-from dataclasses import dataclass, field
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
 from functools import cached_property
+from pathlib import Path
 from typing import Iterable
 
 import sh
+from documented import DocumentedError
 
-from jeeves_pr_stack import github
-from jeeves_pr_stack.errors import MergeConflicts
-from jeeves_pr_stack.models import Commit, PullRequest, RawPullRequest
+from jeeves_pr_stack import daemon, git_state, github
+from jeeves_pr_stack.broker import QueryBroker
+from jeeves_pr_stack.cache import SnapshotCache
+from jeeves_pr_stack.format import (
+    navigation_comment_marker,
+    pull_request_stack_as_markdown,
+)
+from jeeves_pr_stack.errors import (
+    GitHubApiError,
+    GitHubUnreachable,
+    NoCachedSnapshot,
+)
+from jeeves_pr_stack.models import (
+    WATCH_MAX_INTERVAL,
+    WATCH_MIN_INTERVAL,
+    BranchState,
+    CachePolicy,
+    ChecksStatus,
+    CommentAction,
+    CommentUpsert,
+    Commit,
+    CreatedPullRequest,
+    FailedChecks,
+    MutationKind,
+    NavigationComment,
+    PopStep,
+    PredictedConflict,
+    PullRequest,
+    PullRequestRef,
+    QueuedMutation,
+    RawPullRequest,
+    RebaseStep,
+    RawRepositorySnapshot,
+    ReplayedMutation,
+    RepositoryStacks,
+    ServedStack,
+    Snapshot,
+    SplitPoint,
+    StackState,
+)
+from jeeves_pr_stack.outbox import Outbox
+from jeeves_pr_stack.rebase import StackRebase
+from jeeves_pr_stack.stack_index import StackIndex
+from jeeves_pr_stack.tracing import TracedCommand
+from jeeves_pr_stack.transport import (
+    REMOTE_URL_PATTERN,
+    GitHubTransport,
+    construct_transport,
+    raise_if_unreachable,
+)
 
+# How many comments are posted or edited at once.
+COMMENT_WORKERS = 8
 
-@dataclass
-class JeevesPullRequestStack:
-    """Jeeves PR Stack application."""
+# How many PRs `split` opens at once.
+PULL_REQUEST_CREATION_WORKERS = 4
+
+# Details of this many PRs fetched last are kept for use while offline.
+KNOWN_PULL_REQUESTS_LIMIT = 1000
+
+# How many repositories the dashboard queries at once.
+DASHBOARD_WORKERS = 8
+
+# PRs in these merge states can be merged right away. `UNSTABLE` means only
+# checks which are not required have failed.
+READY_MERGE_STATES = frozenset(("CLEAN", "HAS_HOOKS", "UNSTABLE"))
+
+# Required checks of a `BLOCKED` PR may still be running.
+PENDING_CHECKS_STATES = frozenset(("PENDING", "EXPECTED"))
 
-    gh: sh.Command = field(
-        default_factory=lambda: sh.gh.bake(
+# Polling for mergeability backs off from the first delay to the last one.
+MERGEABILITY_POLL_DELAYS = (1, 2, 4, 8, 15)
+MERGEABILITY_TIMEOUT = 600
+
+# `git push` failures which trying again later would not fix; any other
+# failure is taken for the network being still down.
+PUSH_REJECTIONS = (
+    b"[rejected]",
+    b"[remote rejected]",
+    b"stale info",
+    b"src refspec",
+)
+
+
+def construct_gh(**environment: str) -> sh.Command:
+    """`gh` with plain output, given extra environment variables."""
+    return TracedCommand(
+        sh.gh.bake(
             _long_sep=None,
             _tty_out=False,
             _env={
                 **os.environ,
                 "NO_COLOR": "1",
+                **environment,
             },
         ),
     )
-    git: sh.Command = field(default_factory=lambda: sh.git)
+
+
+@dataclass
+class JeevesPullRequestStack:
+    """Jeeves PR Stack application."""
+
+    gh: sh.Command = field(default_factory=construct_gh)
+    git: sh.Command = field(default_factory=lambda: TracedCommand(sh.git))
+    cache_policy: CachePolicy = CachePolicy.FRESH
+    broker: QueryBroker = field(default_factory=QueryBroker)
+
+    # Branch to show the stack of; the checked out one by default.
+    branch: str | None = None
+
+    # `[HOST/]OWNER/REPO` to work with when there is no local checkout; `gh`
+    # must be pointed at it too, via `GH_REPO`.
+    remote: str | None = None
+
+    @cached_property
+    def transport(self) -> GitHubTransport:
+        """Client of GitHub API, reusing connections across requests."""
+        return construct_transport(gh=self.gh, remote_url=self.repository)
+
+    @cached_property
+    def state_directory(self) -> Path:
+        """
+        Directory under `.git/` where the app keeps its files.
+
+        Without a checkout, it is kept in the user cache directory.
+        """
+        if self.remote is not None:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or (
+                Path.home() / ".cache"
+            )
+            return Path(cache_home) / "jeeves-pr-stack" / self.remote
+
+        git_directory = self.git(
+            "rev-parse",
+            "--path-format=absolute",
+            "--git-common-dir",
+        ).strip()
+        return Path(git_directory) / "jeeves-pr-stack"
+
+    @property
+    def socket_path(self) -> Path:
+        """Socket the background daemon of current repository listens on."""
+        return daemon.locate_socket(self.state_directory)
+
+    @cached_property
+    def cache(self) -> SnapshotCache:
+        """PR snapshot cache of current repository, stored under `.git/`."""
+        return SnapshotCache(
+            directory=self.state_directory,
+            # Constructing the transport asks `git` & `gh`; only do that
+            # once GitHub is to be contacted.
+            probe=lambda etag: github.probe_pull_requests_watermark(
+                self.transport,
+                etag=etag,
+            ),
+        )
+
+    @cached_property
+    def outbox(self) -> Outbox:
+        """Mutations queued while GitHub is out of reach."""
+        return Outbox(path=self.state_directory / "outbox.jsonl")
+
+    @property
+    def is_offline(self) -> bool:
+        """Whether GitHub is not contacted, by choice or of necessity."""
+        return (
+            self.cache_policy == CachePolicy.OFFLINE
+            or self.cache.unreachable is not None
+        )
+
+    @property
+    def stale_since(self) -> float | None:
+        """When the oldest PR data served from cache as it is was fetched."""
+        return self.cache.stale_since
+
+    @cached_property
+    def repository(self) -> str:
+        """Identify current repository by its `origin` URL."""
+        if self.remote is not None:
+            host, _slash, name = self.remote.rpartition("/")
+            return f"https://{host or 'github.com'}/{name}"
+
+        try:
+            return self.git.remote("get-url", "origin").strip()
+        except sh.ErrorReturnCode:
+            return str(self.state_directory.parent)
+
+    @property
+    def snapshot(self) -> RawRepositorySnapshot:
+        """Default branch & all open PRs of the repo."""
+        stack_snapshot = self.broker.get(
+            ("topology", "stack", self.starting_branch),
+        )
+        if stack_snapshot is not None and stack_snapshot["isComplete"]:
+            # Every page has been fetched for the stack already.
+            return stack_snapshot
+
+        return self.broker.fetch(
+            ("topology", "snapshot"),
+            functools.partial(
+                self.cache.retrieve,
+                key=f"{self.repository}|snapshot",
+                fetch=functools.partial(
+                    github.retrieve_repository_snapshot,
+                    self.transport,
+                    branch=self.starting_branch,
+                ),
+                policy=self.cache_policy,
+            ),
+        )
+
+    @property
+    def stack_snapshot(self) -> RawRepositorySnapshot:
+        """Default branch & open PRs of the repo sufficient to build stack."""
+        if self.broker.has(("topology", "snapshot")):
+            return self.snapshot
+
+        return self.broker.fetch(
+            ("topology", "stack", self.starting_branch),
+            functools.partial(
+                self.cache.retrieve,
+                key=f"{self.repository}|stack|{self.starting_branch}",
+                fetch=functools.partial(
+                    github.retrieve_stack_snapshot,
+                    self.transport,
+                    branch=self.starting_branch,
+                ),
+                policy=self.cache_policy,
+            ),
+        )
+
+    @property
+    def stack_pull_request_refs(self) -> list[PullRequestRef]:
+        """Positions of PRs from the stack snapshot in the branch graph."""
+        return github.construct_pull_request_refs(
+            self.stack_snapshot["pullRequests"],
+        )
+
+    @property
+    def stack_index(self) -> StackIndex:
+        """Index of branches connected by PRs, built once per snapshot."""
+        return self.broker.fetch(
+            ("topology", "stack_index", self.starting_branch),
+            lambda: StackIndex.from_pull_requests(self.stack_pull_request_refs),
+        )
+
+    @property
+    def default_branch(self) -> str:
+        """Default branch of the repo."""
+        return self.stack_snapshot["defaultBranch"]
+
+    def list_pull_request_refs(
+        self,
+        author: str | None = None,
+    ) -> list[PullRequestRef]:
+        """List positions of all open PRs in the branch graph."""
+        if author == "@me":
+            author = self.snapshot["viewer"]
+
+        return [
+            pr
+            for pr in github.construct_pull_request_refs(
+                self.snapshot["pullRequests"],
+            )
+            if author is None or pr.author == author
+        ]
+
+    def retrieve_pull_requests(
+        self,
+        pull_request_refs: list[PullRequestRef],
+    ) -> list[PullRequest]:
+        """
+        Fetch statuses of the given PRs in one batch, preserving order.
+
+        PRs already fetched during this run are not requested again. Offline,
+        the last known status of each PR is used; PRs never fetched before
+        are left out.
+        """
+        ids = [pr.id for pr in pull_request_refs]
+        missing_ids = [
+            pr_id for pr_id in ids if not self.broker.has(("details", pr_id))
+        ]
+
+        if missing_ids:
+            try:
+                raw_pull_requests: list[RawPullRequest] = self.cache.retrieve(
+                    key=f"{self.repository}|details|{','.join(missing_ids)}",
+                    fetch=functools.partial(
+                        self._fetch_pull_request_details,
+                        ids=missing_ids,
+                    ),
+                    policy=self.cache_policy,
+                    is_settled=_are_checks_settled,
+                )
+            except (GitHubUnreachable, NoCachedSnapshot):
+                raw_pull_requests = self._recall_pull_request_details(
+                    missing_ids,
+                )
+
+            for pr_id in missing_ids:
+                # Closed PRs come back as nothing; do not ask for them again.
+                self.broker.store(("details", pr_id), None)
+
+            for raw_pull_request in raw_pull_requests:
+                self.broker.store(
+                    ("details", raw_pull_request["id"]),
+                    self._construct_pull_request(raw_pull_request),
+                )
+
+        return [
+            pr
+            for pr_id in ids
+            if (pr := self.broker.get(("details", pr_id))) is not None
+        ]
+
+    @property
+    def known_pull_requests_key(self) -> str:
+        """Cache key of the last known details of each PR."""
+        return f"{self.repository}|known-details"
+
+    def _fetch_pull_request_details(
+        self,
+        ids: list[str],
+    ) -> list[RawPullRequest]:
+        """Fetch details of PRs, remember each of them for offline use."""
+        raw_pull_requests = github.retrieve_pull_request_details(
+            self.transport,
+            ids=ids,
+        )
+
+        known_pull_requests = self.cache.load(self.known_pull_requests_key)
+        known_by_id = known_pull_requests.payload if known_pull_requests else {}
+        fetched_at = time.time()
+        for raw_pull_request in raw_pull_requests:
+            # Re-insert to keep the most recently fetched PRs last.
+            known_by_id.pop(raw_pull_request["id"], None)
+            known_by_id[raw_pull_request["id"]] = {
+                "fetchedAt": fetched_at,
+                "pullRequest": raw_pull_request,
+            }
+
+        self.cache.store(
+            self.known_pull_requests_key,
+            Snapshot(
+                etag=None,
+                fetched_at=fetched_at,
+                payload=dict(
+                    list(known_by_id.items())[-KNOWN_PULL_REQUESTS_LIMIT:],
+                ),
+            ),
+        )
+        return raw_pull_requests
+
+    def _recall_pull_request_details(
+        self,
+        ids: list[str],
+    ) -> list[RawPullRequest]:
+        """Last known details of the PRs which were ever fetched."""
+        known_pull_requests = self.cache.load(self.known_pull_requests_key)
+        if known_pull_requests is None:
+            return []
+
+        known_entries = [
+            known_pull_requests.payload[pr_id]
+            for pr_id in ids
+            if pr_id in known_pull_requests.payload
+        ]
+        for known_entry in known_entries:
+            self.cache.mark_stale(known_entry["fetchedAt"])
+
+        return [known_entry["pullRequest"] for known_entry in known_entries]
 
     def list_pull_requests(
         self,
@@ -37,112 +393,546 @@ class JeevesPullRequestStack:
 
         Mark the one bound to current branch with `is_current` field.
         """
-        fields = [
-            "number",
-            "baseRefName",
-            "headRefName",
-            "id",
-            "isDraft",
-            "mergeable",
-            "title",
-            "url",
-            "reviewDecision",
-            "reviewRequests",
-            "statusCheckRollup",
-        ]
-
-        gh_pr_list = self.gh.pr.list.bake(json=",".join(fields))
-        if author:
-            gh_pr_list = gh_pr_list.bake(author=author)
+        return self.retrieve_pull_requests(
+            self.list_pull_request_refs(author=author),
+        )
 
-        raw_pull_requests: list[RawPullRequest] = json.loads(
-            gh_pr_list(),
+    def _construct_pull_request(
+        self,
+        raw_pull_request: RawPullRequest,
+    ) -> PullRequest:
+        return PullRequest(
+            is_current=(
+                raw_pull_request["headRefName"] == self.starting_branch
+            ),
+            number=raw_pull_request["number"],
+            base_branch=sys.intern(raw_pull_request["baseRefName"]),
+            branch=sys.intern(raw_pull_request["headRefName"]),
+            title=raw_pull_request["title"],
+            url=raw_pull_request["url"],
+            is_draft=raw_pull_request["isDraft"],
+            mergeable=sys.intern(raw_pull_request["mergeable"]),
+            review_decision=sys.intern(raw_pull_request["reviewDecision"]),
+            reviewers=[
+                sys.intern(
+                    review_request.get("login") or review_request["name"],
+                )
+                for review_request in raw_pull_request["reviewRequests"]
+            ],
+            checks_status=github.construct_checks_status(raw_pull_request),
+            author=sys.intern(raw_pull_request["author"]["login"]),
+            id=raw_pull_request["id"],
         )
 
-        return [
-            PullRequest(
-                is_current=(raw_pull_request["headRefName"] == self.starting_branch),
-                number=raw_pull_request["number"],
-                base_branch=raw_pull_request["baseRefName"],
-                branch=raw_pull_request["headRefName"],
-                title=raw_pull_request["title"],
-                url=raw_pull_request["url"],
-                is_draft=raw_pull_request["isDraft"],
-                mergeable=raw_pull_request["mergeable"],
-                review_decision=raw_pull_request["reviewDecision"],
-                reviewers=[
-                    review_request.get("login") or review_request["name"]
-                    for review_request in raw_pull_request["reviewRequests"]
-                ],
-                checks_status=github.construct_checks_status(raw_pull_request),
+    def update_pull_request_base(
+        self,
+        pull_request: PullRequest,
+        base_branch: str,
+    ) -> None:
+        """Direct a PR to another base branch."""
+        github.update_pr_base(self.transport, pull_request.number, base_branch)
+        self.forget_pull_request(pull_request)
+
+    def merge_pull_request(self, pull_request: PullRequest) -> None:
+        """Merge a PR with a merge commit."""
+        github.merge_pull_request(self.transport, pull_request.number)
+        self.forget_pull_request(pull_request)
+
+    def wait_until_mergeable(self, pull_request: PullRequest) -> str | None:
+        """
+        Poll GitHub until the PR can be merged, or surely cannot.
+
+        Returns the reason the PR cannot be merged, or `None` if it can.
+        Mergeability is recomputed after each retargeting, and required
+        checks may be running; both are waited for.
+        """
+        deadline = time.monotonic() + MERGEABILITY_TIMEOUT
+        delays = iter(MERGEABILITY_POLL_DELAYS)
+        delay = next(delays)
+
+        while True:  # noqa: WPS457
+            merge_state = github.retrieve_merge_state(
+                self.transport,
+                pull_request.id,
             )
-            for raw_pull_request in raw_pull_requests
-        ]
+            merge_state_status = merge_state["mergeStateStatus"]
 
-    def list_commits(self) -> list[Commit]:
-        """List commits for current PR."""
-        raw_commits = json.loads(self.gh.pr.view(json="commits"))["commits"]
+            if merge_state["mergeable"] == "CONFLICTING":
+                return "has merge conflicts"
 
-        return [
-            Commit(
-                oid=raw_commit["oid"],
-                title=raw_commit["messageHeadline"],
+            if merge_state_status in READY_MERGE_STATES:
+                return None
+
+            is_pending = (
+                merge_state["mergeable"] == "UNKNOWN"
+                or merge_state_status == "UNKNOWN"
+                or (
+                    merge_state_status == "BLOCKED"
+                    and merge_state["checksState"] in PENDING_CHECKS_STATES
+                )
             )
-            for raw_commit in raw_commits
-        ]
+            if not is_pending:
+                return f"cannot be merged: {merge_state_status.lower()}"
+
+            if time.monotonic() + delay > deadline:
+                return "GitHub has not decided whether it can be merged"
+
+            time.sleep(delay)
+            delay = next(delays, delay)
+
+    def pop(
+        self,
+        stack: list[PullRequest],
+        count: int,
+        default_branch: str,
+    ) -> Iterable[PopStep]:
+        """
+        Merge `count` bottom-most PRs of the stack one after another.
+
+        Before a PR is merged, PRs directed to it are retargeted to the
+        default branch. Merged branches are deleted in background while the
+        next PR is processed. Stops at the first PR which is not ready.
+        """
+        landed_branches = {default_branch}
+        blocked_step = None
+        try:
+            with ThreadPoolExecutor() as executor:
+                deletions = []
+                for pull_request in stack[:count]:
+                    if pull_request.base_branch in landed_branches:
+                        blocker = self.wait_until_mergeable(pull_request)
+                    else:
+                        blocker = f"is directed to {pull_request.base_branch}"
+
+                    if blocker is not None:
+                        blocked_step = PopStep(
+                            pull_request=pull_request,
+                            blocker=blocker,
+                        )
+                        break
+
+                    for dependant_pr in stack:
+                        if dependant_pr.base_branch == pull_request.branch:
+                            self.update_pull_request_base(
+                                dependant_pr,
+                                default_branch,
+                            )
+
+                    self.merge_pull_request(pull_request)
+                    landed_branches.add(pull_request.branch)
+                    deletions.append(
+                        executor.submit(
+                            self.git.push,
+                            "origin",
+                            "--delete",
+                            pull_request.branch,
+                        ),
+                    )
+                    yield PopStep(pull_request=pull_request)
+
+                for deletion in deletions:
+                    deletion.result()
+        finally:
+            # Even if something has gone wrong midway, the stack has changed.
+            self.refresh_served_stacks()
+
+        if blocked_step is not None:
+            yield blocked_step
+
+    def forget_pull_request(self, pull_request: PullRequest) -> None:
+        """Drop what this run knows about a PR which has just changed."""
+        self.broker.invalidate("details", pull_request.id)
+        self.broker.invalidate("topology")
+        self.cache.forget_watermarks()
+
+    def list_commits(self, pull_request: PullRequest) -> list[Commit]:
+        """
+        List commits of a PR, oldest first.
+
+        They are read from the local repository; the base branch is fetched
+        only if it is missing locally.
+        """
+        base = f"refs/remotes/origin/{pull_request.base_branch}"
+        head = f"refs/heads/{pull_request.branch}"
+
+        try:
+            return git_state.list_commits(self.git, base=base, head=head)
+        except sh.ErrorReturnCode_128:
+            self.git.fetch("origin", pull_request.base_branch)
+
+        return git_state.list_commits(self.git, base=base, head=head)
 
     @cached_property
     def starting_branch(self):
         """Branch in which the app was started."""
+        if self.branch is not None:
+            return self.branch
+
+        if self.remote is not None:
+            # Nothing is checked out without a local repository.
+            return ""
+
         return self.git.branch("--show-current").strip()
 
     def split(
         self,
         pull_request_to_split: PullRequest,
-        splitting_commit: Commit,
-        new_pr_branch_name: str,
-    ):
-        """Split a pull request into two smaller ones."""
-        self.git.checkout(splitting_commit.oid)
-
-        self.git.switch("-c", new_pr_branch_name)
-        self.gh.pr.create(
+        split_points: list[SplitPoint],
+    ) -> list[CreatedPullRequest]:
+        """
+        Split a PR into a chain of smaller ones, one per split point.
+
+        New branches are created without touching the working tree and pushed
+        at once; their PRs are opened concurrently. The original PR is then
+        directed to the last of them.
+        """
+        self.git(
+            "update-ref",
+            "--stdin",
+            _in="".join(
+                f"create refs/heads/{point.branch} {point.commit.oid}\n"
+                for point in split_points
+            ),
+        )
+
+        branches = [split_point.branch for split_point in split_points]
+        self.git.push("--atomic", "--set-upstream", "origin", *branches)
+
+        base_branches = [pull_request_to_split.base_branch, *branches[:-1]]
+        with ThreadPoolExecutor(
+            max_workers=PULL_REQUEST_CREATION_WORKERS,
+        ) as executor:
+            urls = list(
+                executor.map(
+                    self._create_pull_request,
+                    branches,
+                    base_branches,
+                ),
+            )
+
+        self.broker.invalidate("topology")
+        self.update_pull_request_base(pull_request_to_split, branches[-1])
+        self.refresh_served_stacks()
+
+        return [
+            CreatedPullRequest(branch=branch, base_branch=base_branch, url=url)
+            for branch, base_branch, url in zip(branches, base_branches, urls)
+        ]
+
+    def _create_pull_request(self, branch: str, base_branch: str) -> str:
+        return self.gh.pr.create(
             "--fill",
-            base=pull_request_to_split.base_branch,
+            head=branch,
+            base=base_branch,
             assignee="@me",
-            _in=sys.stdin,
-            _out=sys.stdout,
-        )
+        ).strip()
 
-        github.update_pr_base(
-            self.gh,
-            pull_request_to_split.number,
-            new_pr_branch_name,
+    def collect_branch_states(
+        self,
+        stack: list[PullRequest],
+    ) -> dict[str, BranchState]:
+        """Describe local state of every branch of the stack."""
+        return git_state.collect_branch_states(self.git, stack)
+
+    def collect_failed_checks(
+        self,
+        stack: list[PullRequest],
+    ) -> dict[str, FailedChecks]:
+        """
+        Find failed checks of each PR in the stack, by PR branch.
+
+        Only PRs whose checks have failed are asked about.
+        """
+        branch_by_id = {
+            pr.id: pr.branch
+            for pr in stack
+            if pr.checks_status == ChecksStatus.FAILURE
+        }
+        if not branch_by_id or self.is_offline:
+            return {}
+
+        failed_checks = github.retrieve_failed_checks(
+            self.transport,
+            ids=list(branch_by_id),
         )
+        return {
+            branch_by_id[pr_id]: pr_failed_checks
+            for pr_id, pr_failed_checks in failed_checks.items()
+        }
 
-    def rebase(self) -> Iterable[PullRequest]:
-        """Rebase all PRs in current stack."""
-        stack = self.list_stack()
+    def queue_mutation(self, mutation: QueuedMutation) -> None:
+        """Put a mutation aside until GitHub is reachable again."""
+        self.outbox.append(mutation)
+
+    def replay_mutations(self) -> Iterable[ReplayedMutation]:
+        """
+        Apply mutations queued while offline, oldest first.
 
-        for pr in stack:
-            yield pr
+        Raises `GitHubUnreachable` if GitHub is still out of reach; what has
+        not been replayed stays queued. A mutation which cannot be applied,
+        for instance because the stack has changed since, is dropped.
+        """
+        mutations = self.outbox.read()
+        if not mutations:
+            return
 
-            self.git.switch(pr.branch)
-            self.git.pull()
+        # Fail early rather than have the stack served from cache.
+        github.probe_pull_requests_watermark(self.transport, etag=None)
 
+        for index, mutation in enumerate(mutations):
             try:
-                self.git.pull.origin(pr.base_branch, "--rebase")
+                blocker = self._replay_mutation(mutation)
+            except GitHubUnreachable:
+                self.outbox.write(mutations[index:])
+                raise
+
+            self.outbox.write(mutations[index + 1:])
+            yield ReplayedMutation(mutation=mutation, blocker=blocker)
+
+    def _replay_mutation(self, mutation: QueuedMutation) -> str | None:
+        if mutation.kind == MutationKind.PUSH:
+            try:
+                self.git.push("--set-upstream", "origin", mutation.branch)
             except sh.ErrorReturnCode as err:
-                standard_output = err.stdout.decode()
+                reason = err.stderr.decode().strip()
+                if any(
+                    rejection in err.stderr for rejection in PUSH_REJECTIONS
+                ):
+                    return reason
 
-                if "Merge conflict in" in standard_output:
-                    raise MergeConflicts()
+                raise GitHubUnreachable(reason=reason) from err
 
-                raise
+            try:
+                self._create_pull_request(
+                    mutation.branch,
+                    mutation.base_branch,
+                )
+            except sh.ErrorReturnCode as err:
+                raise_if_unreachable(err)
+                return err.stderr.decode().strip()
+
+            self.broker.invalidate("topology")
+            self.refresh_served_stacks()
+            return None
+
+        application = replace(
+            self,
+            branch=mutation.branch,
+            cache_policy=CachePolicy.FRESH,
+            broker=QueryBroker(),
+        )
+        stack = application.list_stack()
+        if application.cache.unreachable is not None:
+            raise application.cache.unreachable
 
-            self.git.push("--force")
+        count = len(mutation.pull_request_numbers)
+        if [pr.number for pr in stack[:count]] != mutation.pull_request_numbers:
+            return "the stack has changed since"
 
+        for step in application.pop(
+            stack,
+            count=count,
+            default_branch=application.default_branch,
+        ):
+            if step.blocker is not None:
+                return f"{step.pull_request} {step.blocker}"
+
+        self.broker.invalidate("topology")
+        self.broker.invalidate("details")
+        return None
+
+    @cached_property
+    def stack_rebase(self) -> StackRebase:
+        """Rebase of current stack."""
+        return StackRebase(
+            git=self.git,
+            stack=self.list_stack(),
+            plan_path=self.state_directory / "rebase.json",
+        )
+
+    def predict_rebase_conflicts(self) -> list[PredictedConflict]:
+        """Find out which PRs would conflict, without touching the worktree."""
+        return self.stack_rebase.predict_conflicts()
+
+    def rebase(self) -> Iterable[RebaseStep]:
+        """Rebase all PRs in current stack."""
+        yield from self.stack_rebase.run()
         self.git.switch(self.starting_branch)
+        self.refresh_served_stacks()
+
+    def comment(self, stack: list[PullRequest]) -> Iterable[CommentUpsert]:
+        """
+        Post or edit a navigation comment on every PR of the stack.
+
+        Existing comments are found with one query; those already up to date
+        are not touched, the rest are written concurrently.
+        """
+        navigation_comments = github.retrieve_navigation_comments(
+            self.transport,
+            ids=[pr.id for pr in stack],
+            marker=navigation_comment_marker,
+        )
+
+        with ThreadPoolExecutor(max_workers=COMMENT_WORKERS) as executor:
+            futures = [
+                executor.submit(
+                    self._upsert_navigation_comment,
+                    pull_request=pr,
+                    body=pull_request_stack_as_markdown(stack, pr),
+                    navigation_comment=navigation_comments.get(pr.id),
+                )
+                for pr in stack
+            ]
+
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _upsert_navigation_comment(
+        self,
+        pull_request: PullRequest,
+        body: str,
+        navigation_comment: NavigationComment | None,
+    ) -> CommentUpsert:
+        if navigation_comment is None:
+            github.create_comment(self.transport, pull_request.number, body)
+            action = CommentAction.CREATED
+
+        elif navigation_comment.body != body:
+            github.update_comment(self.transport, navigation_comment.id, body)
+            action = CommentAction.UPDATED
+
+        else:
+            action = CommentAction.UNCHANGED
+
+        return CommentUpsert(pull_request=pull_request, action=action)
+
+    def list_stacks(
+        self,
+        author: str | None = None,
+    ) -> dict[str, list[PullRequest]]:
+        """
+        List every stack in the repo, grouped by root branch.
+
+        Forks are kept: each stack is ordered depth first, from the root up.
+        Given `author`, only stacks with PRs of that author are listed, and
+        only their PRs are fetched.
+        """
+        pull_request_refs = self.list_pull_request_refs()
+        forest = StackIndex.from_pull_requests(pull_request_refs).forest()
+
+        if author is not None:
+            authored_branches = {
+                pr.branch for pr in self.list_pull_request_refs(author=author)
+            }
+            forest = {
+                root: heads
+                for root, heads in forest.items()
+                if authored_branches.intersection(heads)
+            }
+
+        listed_branches = {head for heads in forest.values() for head in heads}
+        pull_request_by_branch = {
+            pr.branch: pr
+            for pr in self.retrieve_pull_requests([
+                pr for pr in pull_request_refs if pr.branch in listed_branches
+            ])
+        }
+        return {
+            root: [
+                pull_request_by_branch[head]
+                for head in heads
+                if head in pull_request_by_branch
+            ]
+            for root, heads in forest.items()
+        }
+
+    def watch_stack(
+        self,
+        min_interval: float = WATCH_MIN_INTERVAL,
+        max_interval: float = WATCH_MAX_INTERVAL,
+    ) -> Iterable[StackState]:
+        """
+        Yield state of current stack every time it changes.
+
+        Each poll is a conditional request, free of charge if no PR has
+        changed; PR details are only fetched again while checks are running.
+        The interval doubles while nothing changes, up to `max_interval`.
+        """
+        previous_state = None
+        interval = min_interval
+        while True:  # noqa: WPS457
+            try:
+                stack = self.list_stack()
+                stack_state = StackState(
+                    stack=stack,
+                    branch_states=self.collect_branch_states(stack),
+                )
+            except (
+                GitHubApiError,
+                GitHubUnreachable,
+                NoCachedSnapshot,
+                sh.ErrorReturnCode,
+                OSError,
+            ) as err:
+                # Most likely, the rate limit is exhausted, the network is
+                # down or git is busy; report that & wait it out.
+                stack_state = replace(
+                    previous_state or StackState(stack=[], branch_states={}),
+                    error=_describe_failure(err),
+                )
+                interval = max_interval
+            else:
+                if stack_state == previous_state:
+                    interval = min(interval * 2, max_interval)
+                else:
+                    interval = min_interval
+
+            if stack_state != previous_state:
+                yield stack_state
+                previous_state = stack_state
+
+            time.sleep(interval)
+
+            self.broker.invalidate("topology")
+            self.broker.invalidate("details")
+            self.cache.forget_watermarks()
+
+    def retrieve_served_stack(self) -> ServedStack | None:
+        """Ask the background daemon for current stack, if it is running."""
+        if self.cache_policy == CachePolicy.OFFLINE:
+            return None
+
+        return daemon.request_stack(self.socket_path, self.starting_branch)
+
+    def refresh_served_stacks(self) -> None:
+        """Make the background daemon, if any, forget what it has served."""
+        daemon.request(self.socket_path, {"method": "refresh"})
+
+    def serve(self) -> None:
+        """Run the background daemon for current repository."""
+        daemon.StackDaemon(
+            socket_path=self.socket_path,
+            construct_application=lambda branch: JeevesPullRequestStack(
+                gh=self.gh,
+                git=self.git,
+                branch=branch,
+            ),
+        ).serve_forever()
+
+    def retrieve_stack(self, may_be_served: bool = True) -> ServedStack:
+        """Current stack, from the background daemon if it is running."""
+        served_stack = self.retrieve_served_stack() if may_be_served else None
+        if served_stack is not None:
+            return served_stack
+
+        stack = self.list_stack()
+        return ServedStack(
+            stack=stack,
+            default_branch=self.default_branch,
+            failed_checks=self.collect_failed_checks(stack),
+            stale_since=self.stale_since,
+            is_unreachable=self.cache.unreachable is not None,
+        )
 
     def list_stack(self) -> list[PullRequest]:
         """
@@ -150,7 +940,98 @@ class JeevesPullRequestStack:
 
         Order: from top branch to the main branch of the repository.
         """
-        return github.construct_stack_for_branch(
-            branch=self.starting_branch,
-            pull_requests=self.list_pull_requests(),
+        pull_request_by_branch = {
+            pr.branch: pr for pr in self.stack_pull_request_refs
+        }
+        return self.retrieve_pull_requests([
+            pull_request_by_branch[head]
+            for head in self.stack_index.stack_for_branch(self.starting_branch)
+        ])
+
+
+def construct_application_for(
+    target: str,
+    cache_policy: CachePolicy = CachePolicy.FRESH,
+) -> JeevesPullRequestStack:
+    """
+    Construct the app for a local checkout or a `[HOST/]OWNER/REPO` name.
+
+    An existing directory is taken for a checkout.
+    """
+    checkout = Path(target).expanduser()
+    if checkout.is_dir():
+        return JeevesPullRequestStack(
+            gh=construct_gh().bake(_cwd=str(checkout)),
+            git=TracedCommand(sh.git.bake(_cwd=str(checkout))),
+            cache_policy=cache_policy,
         )
+
+    if REMOTE_URL_PATTERN.match(f"https://github.com/{target}") is None:
+        raise ValueError(f"Neither a directory nor OWNER/REPO: {target}")
+
+    return JeevesPullRequestStack(
+        gh=construct_gh(GH_REPO=target),
+        cache_policy=cache_policy,
+        remote=target,
+    )
+
+
+def collect_repository_stacks(
+    target: str,
+    cache_policy: CachePolicy = CachePolicy.FRESH,
+    author: str | None = "@me",
+) -> RepositoryStacks:
+    """Stacks of one repository, or the reason they cannot be listed."""
+    try:
+        application = construct_application_for(target, cache_policy)
+        return RepositoryStacks(
+            repository=target,
+            stacks=application.list_stacks(author=author),
+            default_branch=application.default_branch,
+            current_branch=application.starting_branch,
+        )
+    except (
+        DocumentedError,
+        OSError,
+        ValueError,
+        sh.ErrorReturnCode,
+    ) as err:
+        # One broken repository must not take the whole dashboard down.
+        return RepositoryStacks(repository=target, stacks={}, error=str(err))
+
+
+def collect_dashboard(
+    targets: list[str],
+    cache_policy: CachePolicy = CachePolicy.FRESH,
+    author: str | None = "@me",
+) -> Iterable[RepositoryStacks]:
+    """
+    Collect stacks from several repositories at once, in the given order.
+
+    Repositories are queried concurrently, so that the whole dashboard takes
+    about as long as the slowest of them.
+    """
+    with ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS) as executor:
+        yield from executor.map(
+            functools.partial(
+                collect_repository_stacks,
+                cache_policy=cache_policy,
+                author=author,
+            ),
+            targets,
+        )
+
+
+def _describe_failure(err: Exception) -> str:
+    if isinstance(err, sh.ErrorReturnCode):
+        return f"{err.full_cmd} failed: {err.stderr.decode().strip()}"
+
+    return str(err)
+
+
+def _are_checks_settled(raw_pull_requests: list[RawPullRequest]) -> bool:
+    """Running checks may finish without bumping the PR `updated_at`."""
+    return all(
+        github.construct_checks_status(raw_pull_request) != ChecksStatus.RUNNING
+        for raw_pull_request in raw_pull_requests
+    )
@@ -1,10 +1,18 @@
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Generic, TypedDict, TypeVar
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Generic, TypedDict, TypeVar
 
-from sh import Command
 from typer import Context
 
+if TYPE_CHECKING:
+    from jeeves_pr_stack.logic import JeevesPullRequestStack
+
+# `j stack watch` polls this often, backing off while nothing changes.
+WATCH_MIN_INTERVAL = 10
+WATCH_MAX_INTERVAL = 120
+
 
 class RawReviewRequest(TypedDict):
     """User that was asked to review a PR."""
@@ -13,10 +21,21 @@ class RawReviewRequest(TypedDict):
     name: str
 
 
-class RawStatusCheck(TypedDict):
-    """PR Status Check."""
+class RawAuthor(TypedDict):
+    """Author of a PR."""
+
+    login: str
+
+
+class RawPullRequestTopology(TypedDict):
+    """Position of a PR in the branch graph."""
 
-    conclusion: str
+    number: int
+    id: str
+    baseRefName: str
+    headRefName: str
+    isCrossRepository: bool
+    author: RawAuthor
 
 
 class RawPullRequest(TypedDict):
@@ -28,11 +47,14 @@ class RawPullRequest(TypedDict):
     title: str
     url: str
     id: str
+    author: RawAuthor
     isDraft: bool
     mergeable: str
     reviewDecision: str
     reviewRequests: list[RawReviewRequest]
-    statusCheckRollup: list[RawStatusCheck]
+
+    # How many check runs & commit statuses are in each state, e.g. `FAILURE`.
+    checkCounts: dict[str, int]
 
 
 class PullRequestStatus(TypedDict):
@@ -42,6 +64,28 @@ class PullRequestStatus(TypedDict):
     currentBranch: RawPullRequest
 
 
+class RawMergeState(TypedDict):
+    """Whether GitHub would let a PR be merged right now."""
+
+    # `MERGEABLE`, `CONFLICTING`, or `UNKNOWN` while GitHub computes it.
+    mergeable: str
+    mergeStateStatus: str
+
+    # State of the check rollup of the head commit, or `''` without checks.
+    checksState: str
+
+
+class RawRepositorySnapshot(TypedDict):
+    """Open PRs of a repository along with its default branch."""
+
+    defaultBranch: str
+    viewer: str
+    pullRequests: list[RawPullRequestTopology]
+
+    # `False` if only the PRs relevant to one stack were fetched.
+    isComplete: bool
+
+
 class ChecksStatus(Enum):
     """Status of PR checks."""
 
@@ -50,7 +94,61 @@ class ChecksStatus(Enum):
     RUNNING = auto()
 
 
+class CachePolicy(Enum):
+    """How stale a cached PR snapshot is allowed to be."""
+
+    # Revalidate the snapshot against GitHub before every use.
+    FRESH = 'fresh'
+
+    # Serve the snapshot right away, revalidate it in background.
+    STALE_WHILE_REVALIDATE = 'stale-while-revalidate'
+
+    # Never touch the network.
+    OFFLINE = 'offline'
+
+
+@dataclass
+class Revalidation:
+    """Result of a conditional request to GitHub."""
+
+    is_modified: bool
+    etag: str | None
+
+
 @dataclass
+class Snapshot:
+    """Cached GitHub response."""
+
+    etag: str | None
+    fetched_at: float
+    payload: Any  # noqa: WPS110
+
+
+@dataclass
+class ApiResponse:
+    """Response of GitHub REST or GraphQL API."""
+
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        """Decode JSON body."""
+        return json.loads(self.body) if self.body else None
+
+
+@dataclass(slots=True)
+class PullRequestRef:
+    """Position of a PR in the branch graph, without its status."""
+
+    number: int
+    id: str
+    branch: str
+    base_branch: str
+    author: str
+
+
+@dataclass(slots=True)
 class PullRequest:
     """Describe a GitHub PR."""
 
@@ -65,6 +163,8 @@ class PullRequest:
     is_draft: bool
     reviewers: list[str]
     checks_status: ChecksStatus
+    author: str
+    id: str
 
     def __repr__(self):
         """Represent a PR for printing."""
@@ -75,13 +175,180 @@ class PullRequest:
 
 
 @dataclass
-class State:
-    """Application state."""
+class AheadBehind:
+    """How far a branch has diverged from another."""
+
+    ahead: int
+    behind: int
+
+
+@dataclass
+class BranchState:
+    """State of a local branch relative to its upstream & its PR base."""
+
+    tip: str
+    upstream: str | None
+
+    # `None` if the upstream branch is gone.
+    upstream_divergence: AheadBehind | None
+
+    # `None` if the base branch is not available locally.
+    base_divergence: AheadBehind | None
+
+
+@dataclass
+class Span:
+    """Operation timed by `--profile`."""
+
+    name: str
+    category: str
+
+    # Seconds since the tracer was created.
+    started_at: float
+    duration: float
+    thread_id: int
+
+    # Bytes received, exit code & alike.
+    details: dict[str, Any]
+
+
+@dataclass
+class FailedChecks:
+    """Failed checks of a PR: some of them by name, all of them by count."""
+
+    names: list[str]
+    count: int
+
+
+@dataclass
+class ServedStack:
+    """Stack of a branch, as the background daemon serves it."""
 
-    current_branch: str
     stack: list[PullRequest]
-    gh: Command
-    current_pull_request: PullRequest | None = None
+    default_branch: str
+
+    # Failed checks, by PR branch.
+    failed_checks: dict[str, FailedChecks] = field(default_factory=dict)
+
+    # When the oldest PR data served from cache as it is was fetched.
+    stale_since: float | None = None
+    is_unreachable: bool = False
+
+
+@dataclass
+class StackState:
+    """Everything `j stack watch` shows."""
+
+    stack: list[PullRequest]
+    branch_states: dict[str, BranchState]
+
+    # Why the last poll failed; the stack is then the last one retrieved.
+    error: str | None = None
+
+
+@dataclass
+class RebaseStep:
+    """PR about to be rebased, or skipped because it is up to date."""
+
+    pull_request: PullRequest
+    is_up_to_date: bool
+
+
+@dataclass
+class PredictedConflict:
+    """Conflict a rebase of a PR would run into."""
+
+    pull_request: PullRequest
+    paths: list[str]
+
+
+@dataclass
+class PopStep:
+    """PR merged into the default branch, or the one which stopped `pop`."""
+
+    pull_request: PullRequest
+
+    # Why the PR cannot be merged; `None` if it has been merged.
+    blocker: str | None = None
+
+
+@dataclass
+class NavigationComment:
+    """Comment listing the stack a PR belongs to."""
+
+    # `databaseId` of the comment, used by REST API.
+    id: int
+    body: str
+
+
+class CommentAction(Enum):
+    """What happened to the navigation comment of a PR."""
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    UNCHANGED = 'unchanged'
+
+
+@dataclass
+class CommentUpsert:
+    """Navigation comment posted, edited, or left as it was."""
+
+    pull_request: PullRequest
+    action: CommentAction
+
+
+PullRequestType = TypeVar('PullRequestType', PullRequest, PullRequestRef)
+
+
+@dataclass
+class State:
+    """
+    Application state.
+
+    The application & current stack are constructed on first access, so that
+    commands which do not need them start without waiting for GitHub.
+    """
+
+    construct_application: Callable[[CachePolicy], 'JeevesPullRequestStack']
+    cache_policy: CachePolicy = CachePolicy.FRESH
+
+    # Mutating commands must not act upon a stack served from cache or by
+    # the daemon: whatever `--cache` says, they revalidate it first.
+    is_mutating: bool = False
+
+    @cached_property
+    def application(self) -> 'JeevesPullRequestStack':
+        """Application logic."""
+        return self.construct_application(
+            CachePolicy.FRESH if self.is_mutating else self.cache_policy,
+        )
+
+    @property
+    def current_branch(self) -> str:
+        """Branch the stack is shown for."""
+        return self.application.starting_branch
+
+    @cached_property
+    def served_stack(self) -> ServedStack:
+        """Current stack & default branch of the repo."""
+        return self.application.retrieve_stack(
+            may_be_served=not self.is_mutating,
+        )
+
+    @property
+    def stack(self) -> list[PullRequest]:
+        """PRs of current stack."""
+        return self.served_stack.stack
+
+    @property
+    def default_branch(self) -> str:
+        """Default branch of the repo."""
+        return self.served_stack.default_branch
+
+    @property
+    def current_pull_request(self) -> PullRequest | None:
+        """PR of current branch, if any."""
+        return next((pr for pr in self.stack if pr.is_current), None)
 
 
 StateType = TypeVar('StateType')
@@ -103,3 +370,76 @@ class Commit:
 
     oid: str
     title: str
+
+
+@dataclass
+class SplitPoint:
+    """New branch of a PR being split, ending at the given commit."""
+
+    commit: Commit
+    branch: str
+
+
+@dataclass
+class CreatedPullRequest:
+    """PR opened by `j stack split`."""
+
+    branch: str
+    base_branch: str
+    url: str
+
+
+@dataclass
+class RepositoryStacks:
+    """Stacks of one repository on the dashboard, or why they are missing."""
+
+    repository: str
+    stacks: dict[str, list[PullRequest]]
+    default_branch: str = ''
+    current_branch: str = ''
+    error: str | None = None
+
+
+class MutationKind(Enum):
+    """Mutation which can be queued while GitHub is out of reach."""
+
+    # Merge the bottom-most PRs of the stack of a branch.
+    POP = 'pop'
+
+    # Open a PR from a branch, directed to another PR.
+    PUSH = 'push'
+
+
+@dataclass
+class QueuedMutation:
+    """Mutation queued while GitHub was out of reach, to replay later."""
+
+    kind: MutationKind
+    branch: str
+    queued_at: float
+
+    # Pushing: branch the new PR is directed to.
+    base_branch: str = ''
+
+    # Popping: PRs to merge, bottom-most first.
+    pull_request_numbers: list[int] = field(default_factory=list)
+
+    def __str__(self):
+        """Describe the mutation for printing."""
+        if self.kind == MutationKind.POP:
+            numbers = ', '.join(
+                f'#{number}' for number in self.pull_request_numbers
+            )
+            return f'pop {numbers} of {self.branch}'
+
+        return f'push {self.branch} → {self.base_branch}'  # noqa: WPS326
+
+
+@dataclass
+class ReplayedMutation:
+    """Queued mutation, replayed or dropped."""
+
+    mutation: QueuedMutation
+
+    # Why the mutation was dropped instead of being applied, if it was.
+    blocker: str | None = None
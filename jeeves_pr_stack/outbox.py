@@ -0,0 +1,63 @@
+import dataclasses
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from jeeves_pr_stack.models import MutationKind, QueuedMutation
+
+
+@dataclass
+class Outbox:
+    """
+    Mutations queued while GitHub is out of reach, one JSON line each.
+
+    Stored under `.git/` so that the queue outlives the command which filled
+    it; mutations are replayed oldest first.
+    """
+
+    path: Path
+
+    def append(self, mutation: QueuedMutation) -> None:
+        """Queue a mutation after those queued before."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a") as outbox_file:
+            outbox_file.write(f"{_serialize(mutation)}\n")
+
+    def read(self) -> list[QueuedMutation]:
+        """List queued mutations, oldest first."""
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            return []
+
+        return [_deserialize(line) for line in lines if line]
+
+    def write(self, mutations: list[QueuedMutation]) -> None:
+        """Replace the queue atomically; remove it if nothing is left."""
+        if not mutations:
+            self.path.unlink(missing_ok=True)
+            return
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.path.parent)
+        with os.fdopen(descriptor, "w") as temporary_file:
+            temporary_file.writelines(
+                f"{_serialize(mutation)}\n" for mutation in mutations
+            )
+
+        os.replace(temporary_path, self.path)
+
+
+def _serialize(mutation: QueuedMutation) -> str:
+    return json.dumps({
+        **dataclasses.asdict(mutation),
+        "kind": mutation.kind.value,
+    })
+
+
+def _deserialize(line: str) -> QueuedMutation:
+    raw_mutation = json.loads(line)
+    return QueuedMutation(
+        **{**raw_mutation, "kind": MutationKind(raw_mutation["kind"])},
+    )
@@ -0,0 +1,371 @@
+import json
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Iterable
+
+import sh
+
+from jeeves_pr_stack.errors import (
+    DivergentBranches,
+    MergeConflicts,
+    OutdatedGit,
+)
+from jeeves_pr_stack.git_state import count_ahead_behind
+from jeeves_pr_stack.models import (
+    AheadBehind,
+    PredictedConflict,
+    PullRequest,
+    RebaseStep,
+)
+
+# Simulated commits never leave the object database.
+SIMULATION_IDENTITY = (
+    "-c",
+    "user.name=jeeves-pr-stack",
+    "-c",
+    "user.email=jeeves-pr-stack@localhost",
+)
+
+
+@dataclass
+class StackRebase:
+    """
+    Rebase a stack of PRs with a handful of git invocations.
+
+    The remote is fetched once. Each run of PRs in which every branch already
+    contains its base is rewritten by a single `git rebase --update-refs`
+    from its top branch, unless it is up to date; all changed branches are
+    pushed in one go.
+
+    Tips the branches had before rewriting are saved to `plan_path` until
+    the push succeeds. If the rebase stops at a conflict or the push fails,
+    the next run picks up the branches rewritten so far from there.
+    """
+
+    git: sh.Command
+    stack: list[PullRequest]
+    remote: str = "origin"
+    plan_path: Path | None = None
+
+    # Branch tips before anything was rewritten.
+    original_tips: dict[str, str | None] = field(
+        default_factory=dict,
+        init=False,
+    )
+
+    # Branches rewritten by an interrupted run, not pushed yet.
+    resumed_branches: set[str] = field(default_factory=set, init=False)
+
+    @cached_property
+    def current_branch(self) -> str:
+        """Branch checked out before the rebase; empty if HEAD is detached."""
+        return self.git.branch("--show-current").strip()
+
+    @property
+    def branches(self) -> list[str]:
+        """Head branches of the stack, bottom to top."""
+        return [pr.branch for pr in self.stack]
+
+    def run(self) -> Iterable[RebaseStep]:
+        """Rebase the stack, yielding each PR before it is processed."""
+        if not self.stack:
+            return
+
+        # Rewriting detaches HEAD, so remember what to check out afterwards.
+        current_branch = self.current_branch
+
+        self.prepare()
+        self.synchronize()
+
+        rewritten_branches: set[str] = set()
+        for segment in self.plan_segments():
+            is_up_to_date = self.is_up_to_date(segment[0], rewritten_branches)
+            for pr in segment:
+                yield RebaseStep(pull_request=pr, is_up_to_date=is_up_to_date)
+
+            if not is_up_to_date:
+                self.save_plan()
+                self.rewrite(segment)
+                rewritten_branches.update(pr.branch for pr in segment)
+
+        if rewritten_branches and current_branch:
+            self.git.switch(current_branch)
+
+        self.push()
+
+        if self.plan_path is not None:
+            self.plan_path.unlink(missing_ok=True)
+
+    def prepare(self) -> None:
+        """Fetch the stack and figure out where each branch should be."""
+        if self.original_tips:
+            return
+
+        self.fetch()
+        self.resolve_tips()
+
+    def fetch(self) -> None:
+        """Fetch the stack and its root branch in one round trip."""
+        root_branch = self.stack[0].base_branch
+        self.git.fetch(self.remote, root_branch, *self.branches)
+
+    def resolve_tips(self) -> None:
+        """Choose the newest of local & remote tip for every branch."""
+        planned_tips = self.load_plan()
+        for branch in self.branches:
+            remote_tip = self._resolve(f"{self.remote}/{branch}")
+            local_tip = self._resolve(f"refs/heads/{branch}")
+
+            is_resumed = (
+                local_tip is not None
+                and local_tip != remote_tip
+                and planned_tips.get(branch) == remote_tip
+            )
+            if is_resumed:
+                # Rewritten locally from the remote tip, which has not moved
+                # since; keep the rewrite, but rebase from where it started.
+                self.original_tips[branch] = remote_tip
+                self.resumed_branches.add(branch)
+
+            elif remote_tip is None or local_tip == remote_tip:
+                self.original_tips[branch] = local_tip
+
+            elif local_tip is None or self._is_ancestor(local_tip, remote_tip):
+                self.original_tips[branch] = remote_tip
+
+            elif self._is_ancestor(remote_tip, local_tip):
+                self.original_tips[branch] = local_tip
+
+            else:
+                raise DivergentBranches(branch=branch)
+
+    def synchronize(self) -> None:
+        """Fast-forward local branches which are behind the remote."""
+        for branch, tip in self.original_tips.items():
+            if branch in self.resumed_branches:
+                continue
+
+            if self._resolve(f"refs/heads/{branch}") == tip:
+                continue
+
+            if branch == self.current_branch:
+                self.git.merge("--ff-only", tip)
+            else:
+                self.git("update-ref", f"refs/heads/{branch}", tip)
+
+    def load_plan(self) -> dict[str, str]:
+        """Branch tips saved by an interrupted run, if any."""
+        if self.plan_path is None:
+            return {}
+
+        try:
+            return json.loads(self.plan_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_plan(self) -> None:
+        """Remember branch tips before rewriting, for an interrupted run."""
+        if self.plan_path is None:
+            return
+
+        self.plan_path.parent.mkdir(parents=True, exist_ok=True)
+        self.plan_path.write_text(
+            json.dumps({
+                branch: tip
+                for branch, tip in self.original_tips.items()
+                if tip is not None
+            }),
+        )
+
+    def predict_conflicts(self) -> list[PredictedConflict]:
+        """
+        Simulate the rebase of the whole stack in memory.
+
+        Each PR is merged onto the simulated result of its base with
+        `git merge-tree`; neither the working tree nor the index is touched.
+        """
+        if not self.stack:
+            return []
+
+        self.prepare()
+
+        conflicts = []
+        simulated_tips: dict[str, str] = {}
+        for pr in self.stack:
+            new_base, old_base = self._locate_base(pr.base_branch)
+            new_base = simulated_tips.get(pr.base_branch, new_base)
+
+            try:
+                merge_result = self.git(
+                    "merge-tree",
+                    "--write-tree",
+                    "--name-only",
+                    "--no-messages",
+                    f"--merge-base={self._merge_base(old_base, pr.branch)}",
+                    new_base,
+                    self.original_tips[pr.branch],
+                    _ok_code=[0, 1],
+                    _return_cmd=True,
+                )
+            except sh.ErrorReturnCode_129 as err:
+                raise OutdatedGit(
+                    command="git merge-tree --merge-base",
+                    required_version="2.40",
+                ) from err
+
+            tree, *conflicting_paths = str(merge_result).splitlines()
+            if merge_result.exit_code:
+                # Paths are listed once per conflicting stage.
+                unique_paths = dict.fromkeys(filter(None, conflicting_paths))
+                conflicts.append(
+                    PredictedConflict(
+                        pull_request=pr,
+                        paths=list(unique_paths),
+                    ),
+                )
+
+            simulated_tips[pr.branch] = self.git(
+                *SIMULATION_IDENTITY,
+                "commit-tree",
+                tree,
+                "-p",
+                new_base,
+                "-m",
+                f"Simulated rebase of {pr.branch}",
+            ).strip()
+
+        return conflicts
+
+    @cached_property
+    def ahead_behind(self) -> dict[str, AheadBehind]:
+        """Divergence of each branch from its base, before rewriting."""
+        pairs = [
+            (pr.branch, self._locate_base(pr.base_branch)[0])
+            for pr in self.stack
+        ]
+        return {
+            branch: ahead_behind
+            for (branch, _base), ahead_behind in count_ahead_behind(
+                self.git,
+                pairs,
+            ).items()
+        }
+
+    def plan_segments(self) -> list[list[PullRequest]]:
+        """
+        Split the stack into runs of PRs rewritable by one rebase each.
+
+        A new run starts at every PR whose branch lacks the tip of its base
+        branch, and at every fork.
+        """
+        segments: list[list[PullRequest]] = []
+        for pr in self.stack:
+            continues_segment = (
+                segments
+                and segments[-1][-1].branch == pr.base_branch
+                and not self.ahead_behind[pr.branch].behind
+            )
+
+            if continues_segment:
+                segments[-1].append(pr)
+            else:
+                segments.append([pr])
+
+        return segments
+
+    def is_up_to_date(
+        self,
+        pr: PullRequest,
+        rewritten_branches: set[str],
+    ) -> bool:
+        """Check if PR contains its base, and the base stays where it is."""
+        return (
+            pr.base_branch not in rewritten_branches
+            and not self.ahead_behind[pr.branch].behind
+        )
+
+    def rewrite(self, segment: list[PullRequest]) -> None:
+        """Rebase a run of PRs upon the new tip of its base branch."""
+        new_base, old_base = self._locate_base(segment[0].base_branch)
+        upstream = self._merge_base(old_base, segment[0].branch)
+
+        # `--update-refs` skips the checked out branch, which may be in the
+        # middle of the segment; nothing is checked out while rebasing.
+        self.git.switch("--detach")
+
+        try:
+            self.git.rebase(
+                "--update-refs",
+                "--onto",
+                new_base,
+                upstream,
+                segment[-1].branch,
+            )
+        except sh.ErrorReturnCode as err:
+            git_output = err.stdout.decode() + err.stderr.decode()
+            if "CONFLICT" in git_output or "Merge conflict in" in git_output:
+                raise MergeConflicts()
+
+            raise
+
+    def push(self) -> None:
+        """Push changed branches atomically, guarding against races."""
+        raw_tips = self.git(
+            "for-each-ref",
+            "--format=%(refname) %(objectname)",
+            *(f"refs/heads/{branch}" for branch in self.branches),
+            *(
+                f"refs/remotes/{self.remote}/{branch}"
+                for branch in self.branches
+            ),
+        )
+        tips = dict(line.split() for line in str(raw_tips).splitlines())
+
+        leases = []
+        changed_branches = []
+        for branch in self.branches:
+            remote_tip = tips.get(f"refs/remotes/{self.remote}/{branch}")
+            if tips.get(f"refs/heads/{branch}") == remote_tip:
+                continue
+
+            changed_branches.append(branch)
+            if remote_tip is not None:
+                leases.append(f"--force-with-lease={branch}:{remote_tip}")
+
+        if changed_branches:
+            self.git.push("--atomic", *leases, self.remote, *changed_branches)
+
+    def _locate_base(self, base_branch: str) -> tuple[str, str]:
+        """Where the base branch is now, and where it was before rewriting."""
+        if base_branch in self.original_tips:
+            return f"refs/heads/{base_branch}", self.original_tips[base_branch]
+
+        remote_base = f"{self.remote}/{base_branch}"
+        return remote_base, remote_base
+
+    def _merge_base(self, old_base: str, branch: str) -> str:
+        return self.git(
+            "merge-base",
+            old_base,
+            self.original_tips[branch],
+        ).strip()
+
+    def _resolve(self, revision: str) -> str | None:
+        try:
+            return self.git(
+                "rev-parse",
+                "--verify",
+                "--quiet",
+                f"{revision}^{{commit}}",
+            ).strip()
+        except sh.ErrorReturnCode:
+            return None
+
+    def _is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        try:
+            self.git("merge-base", "--is-ancestor", ancestor, descendant)
+        except sh.ErrorReturnCode_1:
+            return False
+
+        return True
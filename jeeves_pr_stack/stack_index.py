@@ -0,0 +1,120 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from jeeves_pr_stack.errors import CyclicStack
+from jeeves_pr_stack.models import PullRequestType
+
+
+@dataclass
+class StackIndex:
+    """
+    Graph of branches connected by open PRs.
+
+    Every PR is an edge directed from its head branch → to its base branch.
+    A branch has at most one base but may have several heads stacked upon it,
+    which makes a fork. A PR from a branch to itself is no edge.
+    """
+
+    base_by_head: dict[str, str] = field(default_factory=dict)
+    heads_by_base: defaultdict[str, list[str]] = field(
+        default_factory=lambda: defaultdict(list),
+    )
+
+    @classmethod
+    def from_pull_requests(
+        cls,
+        pull_requests: Iterable[PullRequestType],
+    ) -> "StackIndex":
+        """Index PRs by their head & base branches."""
+        stack_index = cls()
+        stack_index.add(pull_requests)
+        return stack_index
+
+    def add(self, pull_requests: Iterable[PullRequestType]) -> None:
+        """Add more PRs to the index, for instance as pages arrive."""
+        for pr in pull_requests:
+            previous_base = self.base_by_head.get(pr.branch)
+            if pr.base_branch in {previous_base, pr.branch}:
+                continue
+
+            if previous_base is not None:
+                self.heads_by_base[previous_base].remove(pr.branch)
+
+            self.base_by_head[pr.branch] = pr.base_branch
+            self.heads_by_base[pr.base_branch].append(pr.branch)
+
+    def children_of(self, branch: str) -> list[str]:
+        """Head branches of PRs directed to `branch`."""
+        return self.heads_by_base.get(branch, [])
+
+    def is_fork(self, branch: str) -> bool:
+        """Check whether several PRs are directed to `branch`."""
+        return len(self.children_of(branch)) > 1
+
+    def bases_of(self, branch: str) -> list[str]:
+        """Branches from `branch` down to the root, `branch` excluded."""
+        bases = []
+        visited = {branch}
+        head = branch
+        while (head := self.base_by_head.get(head)) is not None:
+            bases.append(head)
+            if head in visited:
+                raise CyclicStack(branches=[branch, *bases])
+
+            visited.add(head)
+
+        return bases
+
+    def root_of(self, branch: str) -> str:
+        """Branch the stack of `branch` is ultimately directed to."""
+        bases = self.bases_of(branch)
+        return bases[-1] if bases else branch
+
+    def descendants_of(self, branch: str) -> list[str]:
+        """Branches stacked upon `branch`, directly or not, depth first."""
+        descendants = []
+        visited = {branch}
+        pending = list(reversed(self.children_of(branch)))
+        while pending:
+            head = pending.pop()
+            descendants.append(head)
+            if head in visited:
+                raise CyclicStack(branches=descendants)
+
+            visited.add(head)
+            pending.extend(reversed(self.children_of(head)))
+
+        return descendants
+
+    def roots(self) -> list[str]:
+        """Branches PRs are directed to which have no PRs of their own."""
+        return [
+            base
+            for base in self.heads_by_base
+            if base not in self.base_by_head
+        ]
+
+    def forest(self) -> dict[str, list[str]]:
+        """
+        Head branches of every stack in the repo, grouped by root branch.
+
+        Each branch is visited once. Heads unreachable from any root are parts
+        of a cycle.
+        """
+        forest = {root: self.descendants_of(root) for root in self.roots()}
+
+        covered_heads = {head for heads in forest.values() for head in heads}
+        for head in self.base_by_head.keys() - covered_heads:
+            self.bases_of(head)
+
+        return forest
+
+    def stack_for_branch(self, branch: str) -> list[str]:
+        """
+        Head branches of the PRs making up the stack of `branch`.
+
+        Order: from the PR directed to the root upwards.
+        """
+        chain = [branch, *self.bases_of(branch)][:-1]
+        return list(reversed(chain)) + self.descendants_of(branch)
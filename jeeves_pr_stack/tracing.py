@@ -0,0 +1,152 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+
+import sh
+
+from jeeves_pr_stack.models import Span
+
+CallableType = TypeVar("CallableType", bound=Callable[..., Any])
+
+
+@dataclass
+class Tracer:
+    """
+    Record how long subprocesses, GitHub queries & rendering take.
+
+    Does nothing unless enabled, which `--profile` does.
+    """
+
+    is_enabled: bool = False
+    spans: list[Span] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock,
+        init=False,
+        repr=False,
+    )
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str) -> Iterator[dict[str, Any]]:
+        """
+        Time the enclosed block.
+
+        Yields a dict the block may fill with details, like bytes received.
+        """
+        details: dict[str, Any] = {}
+        if not self.is_enabled:
+            yield details
+            return
+
+        started_at = time.perf_counter()
+        try:
+            yield details
+        except Exception as err:
+            details.setdefault("error", type(err).__name__)
+            raise
+        finally:
+            recorded_span = Span(
+                name=name,
+                category=category,
+                started_at=started_at - self.started_at,
+                duration=time.perf_counter() - started_at,
+                thread_id=threading.get_ident(),
+                details=details,
+            )
+            with self._lock:
+                self.spans.append(recorded_span)
+
+    def export_chrome_trace(self, path: Path) -> None:
+        """Write spans in Chrome trace event format, readable by Perfetto."""
+        microseconds = 1_000_000
+        trace_events = [
+            {
+                "name": recorded_span.name,
+                "cat": recorded_span.category,
+                "ph": "X",
+                "ts": recorded_span.started_at * microseconds,
+                "dur": recorded_span.duration * microseconds,
+                "pid": os.getpid(),
+                "tid": recorded_span.thread_id,
+                "args": recorded_span.details,
+            }
+            for recorded_span in self.spans
+        ]
+        path.write_text(
+            json.dumps({"traceEvents": trace_events, "displayTimeUnit": "ms"}),
+        )
+
+
+tracer = Tracer()
+
+
+def traced(category: str) -> Callable[[CallableType], CallableType]:
+    """Time every call of the decorated function."""
+    def decorator(function: CallableType) -> CallableType:  # noqa: WPS430
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):  # noqa: WPS430
+            with tracer.span(function.__name__, category=category):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+@dataclass(frozen=True)
+class TracedCommand:
+    """`sh` command which reports each of its invocations to the tracer."""
+
+    command: sh.Command
+
+    def __getattr__(self, name: str) -> "TracedCommand":
+        """Trace subcommands, like `git.rebase`, as well."""
+        return TracedCommand(getattr(self.command, name))
+
+    def bake(self, *args, **kwargs) -> "TracedCommand":
+        """Bake arguments in, keeping the tracing."""
+        return TracedCommand(self.command.bake(*args, **kwargs))
+
+    def __call__(self, *args, **kwargs):
+        """Run the command."""
+        if not tracer.is_enabled:
+            return self.command(*args, **kwargs)
+
+        # `git rebase`, `gh api graphql` & alike.
+        program, *subcommands = str(self.command).split()
+        subcommands.extend(
+            str(argument)
+            for argument in args[:1]
+            if not str(argument).startswith("-")
+        )
+        name = " ".join([os.path.basename(program), *subcommands])
+
+        with tracer.span(name, category="subprocess") as details:
+            try:
+                running_command = self.command(
+                    *args,
+                    **{**kwargs, "_return_cmd": True},
+                )
+            except sh.ErrorReturnCode as err:
+                details["exit_code"] = err.exit_code
+                details["bytes"] = len(err.stdout or b"")
+                raise
+
+            # `_fg=True` commands return nothing, `_bg=True` ones are running.
+            if running_command is not None and not kwargs.get("_bg"):
+                details["exit_code"] = running_command.exit_code
+                details["bytes"] = len(running_command.stdout or b"")
+
+        if kwargs.get("_return_cmd") or kwargs.get("_bg"):
+            return running_command
+
+        if running_command is None:
+            return None
+
+        return str(running_command)
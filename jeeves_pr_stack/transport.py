@@ -0,0 +1,441 @@
+import gzip
+import http.client
+import json
+import os
+import queue
+import re
+from dataclasses import dataclass, field
+from typing import Protocol
+from urllib.parse import urlsplit
+
+import sh
+
+from jeeves_pr_stack.errors import GitHubApiError, GitHubUnreachable
+from jeeves_pr_stack.models import ApiResponse
+from jeeves_pr_stack.tracing import tracer
+
+# `git@github.com:owner/repo.git`, `https://github.com/owner/repo` & alike.
+REMOTE_URL_PATTERN = re.compile(
+    r"(?:[\w+.-]+://)?(?:[^@/]+@)?(?P<host>[^:/]+)(?::\d+)?[:/]"
+    r"(?P<owner>[^/]+)/(?P<repo>[^/]+?)(?:\.git)?/?$",
+)
+
+OPERATION_NAME_PATTERN = re.compile(r"(?:query|mutation)\s+(?P<name>\w+)")
+
+MUTATION_PATTERN = re.compile(r"\s*mutation\b")
+
+# Requests safe to send again if their response is lost.
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD"))
+
+# `gh` reports that it could not reach GitHub with this message.
+GH_CONNECTION_ERROR = b"error connecting to"
+
+# Where `gh` looks for a token, by whether the host is `github.com`; never
+# send a `github.com` token to another host, or the other way round.
+GITHUB_TOKEN_VARIABLES = ("GH_TOKEN", "GITHUB_TOKEN")
+ENTERPRISE_TOKEN_VARIABLES = ("GH_ENTERPRISE_TOKEN", "GITHUB_ENTERPRISE_TOKEN")
+
+# Set to `gh` to always talk to GitHub through `gh` subprocesses.
+TRANSPORT_ENVIRONMENT_VARIABLE = "JEEVES_PR_STACK_TRANSPORT"
+
+
+class GitHubTransport(Protocol):
+    """
+    Way to reach GitHub API.
+
+    REST paths may contain `{owner}` & `{repo}` placeholders; GraphQL queries
+    may declare `$owner` & `$name` variables. Both are filled in for current
+    repository.
+    """
+
+    def graphql(self, query: str, **variables) -> dict:
+        """Run a GraphQL query, return its `data`."""
+
+    def rest(
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str] | None = None,
+        body: dict | None = None,
+    ) -> ApiResponse:
+        """Send a REST request."""
+
+
+def describe_query(query: str) -> str:
+    """Name a GraphQL query for tracing."""
+    match = OPERATION_NAME_PATTERN.search(query)
+    return f"graphql {match.group('name') if match else 'anonymous'}"
+
+
+def parse_response_head(raw_response: str) -> tuple[int, dict[str, str], str]:
+    """Parse status code, headers & body printed by `gh api --include`."""
+    head, _separator, body = raw_response.replace("\r\n", "\n").partition(
+        "\n\n",
+    )
+    status_line, *header_lines = head.splitlines()
+
+    headers = {}
+    for header_line in header_lines:
+        name, _colon, header_value = header_line.partition(":")
+        headers[name.strip().lower()] = header_value.strip()
+
+    return int(status_line.split()[1]), headers, body
+
+
+def raise_if_unreachable(err: sh.ErrorReturnCode) -> None:
+    """Tell a network failure of `gh` from other errors."""
+    if GH_CONNECTION_ERROR in err.stderr:
+        raise GitHubUnreachable(reason=err.stderr.decode().strip()) from err
+
+
+@dataclass
+class GhTransport:
+    """Talk to GitHub by spawning `gh api`, one process per request."""
+
+    gh: sh.Command
+
+    def graphql(self, query: str, **variables) -> dict:
+        """Run a GraphQL query via `gh api graphql`."""
+        fields = []
+        if "$owner: String!" in query:
+            fields.extend(["-F", "owner={owner}", "-F", "name={repo}"])
+
+        for variable_name, variable_value in variables.items():
+            if isinstance(variable_value, list):
+                fields.extend(
+                    argument
+                    for list_item in variable_value
+                    for argument in ("-f", f"{variable_name}[]={list_item}")
+                )
+            elif isinstance(variable_value, str):
+                # `-f` passes strings verbatim, `-F` would interpret `@file`.
+                fields.extend(["-f", f"{variable_name}={variable_value}"])
+            else:
+                fields.extend(
+                    ["-F", f"{variable_name}={json.dumps(variable_value)}"],
+                )
+
+        with tracer.span(describe_query(query), category="github") as details:
+            try:
+                raw_response = str(
+                    self.gh.api.graphql("-f", f"query={query}", *fields),
+                )
+            except sh.ErrorReturnCode as err:
+                raise_if_unreachable(err)
+
+                # `gh api graphql` exits with non-zero status if the response
+                # has errors, printing it all the same.
+                raw_response = err.stdout.decode()
+                if not raw_response:
+                    raise
+
+            details["bytes"] = len(raw_response)
+
+        with tracer.span("decode JSON", category="json"):
+            payload = json.loads(raw_response)
+        if payload.get("errors"):
+            # GitHub reports most GraphQL errors with `200 OK`.
+            raise GitHubApiError(
+                status=200,
+                message=json.dumps(payload["errors"]),
+            )
+
+        return payload["data"]
+
+    def rest(
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str] | None = None,
+        body: dict | None = None,
+    ) -> ApiResponse:
+        """Send a REST request via `gh api --include`; `304` is no error."""
+        arguments = ["--include", "--method", method]
+        for header_name, header_value in (headers or {}).items():
+            arguments.extend(["-H", f"{header_name}: {header_value}"])
+
+        if body is not None:
+            arguments.extend(["--input", "-"])
+
+        with tracer.span(f"{method} {path}", category="github") as details:
+            try:
+                raw_response = str(
+                    self.gh.api(
+                        *arguments,
+                        path,
+                        _in=json.dumps(body) if body is not None else None,
+                    ),
+                )
+            except sh.ErrorReturnCode as err:
+                raise_if_unreachable(err)
+
+                # `gh api` exits with non-zero status on any non-2xx response.
+                raw_response = err.stdout.decode()
+                if not raw_response:
+                    raise
+
+            status, response_headers, response_body = parse_response_head(
+                raw_response,
+            )
+            details.update(status=status, bytes=len(response_body))
+
+        if status >= 400:
+            raise GitHubApiError(status=status, message=response_body)
+
+        return ApiResponse(
+            status=status,
+            headers=response_headers,
+            body=response_body.encode(),
+        )
+
+
+@dataclass
+class HttpTransport:
+    """
+    Talk to GitHub over pooled keep-alive HTTPS connections.
+
+    Uses the token `gh` has stored, so no separate login is needed.
+    """
+
+    api_url: str
+    graphql_url: str
+    token: str
+    owner: str
+    repo: str
+    timeout: float = 30
+
+    _connections: queue.SimpleQueue = field(
+        default_factory=queue.SimpleQueue,
+        init=False,
+        repr=False,
+    )
+
+    @classmethod
+    def for_remote(cls, remote_url: str, token: str) -> "HttpTransport":
+        """Construct transport for the repository a git remote points to."""
+        match = REMOTE_URL_PATTERN.match(remote_url.strip())
+        if match is None:
+            raise ValueError(f"Cannot parse git remote URL: {remote_url}")
+
+        host = match.group("host")
+        if host == "github.com":
+            api_url = graphql_url = "https://api.github.com"
+        else:
+            # GitHub Enterprise Server
+            api_url = f"https://{host}/api/v3"
+            graphql_url = f"https://{host}/api"
+
+        return cls(
+            api_url=api_url,
+            graphql_url=f"{graphql_url}/graphql",
+            token=token,
+            owner=match.group("owner"),
+            repo=match.group("repo"),
+        )
+
+    def graphql(self, query: str, **variables) -> dict:
+        """Run a GraphQL query."""
+        if "$owner: String!" in query:
+            variables = {**variables, "owner": self.owner, "name": self.repo}
+
+        with tracer.span(describe_query(query), category="github") as details:
+            response = self._request(
+                "POST",
+                self.graphql_url,
+                body={"query": query, "variables": variables},
+                is_idempotent=MUTATION_PATTERN.match(query) is None,
+            )
+            details.update(status=response.status, bytes=len(response.body))
+
+        with tracer.span("decode JSON", category="json"):
+            payload = response.json()
+        if response.status >= 300 or payload.get("errors"):
+            raise GitHubApiError(
+                status=response.status,
+                message=json.dumps(payload.get("errors") or payload),
+            )
+
+        return payload["data"]
+
+    def rest(
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str] | None = None,
+        body: dict | None = None,
+    ) -> ApiResponse:
+        """Send a REST request; `304 Not Modified` is not an error."""
+        url = f"{self.api_url}/{path.format(owner=self.owner, repo=self.repo)}"
+        with tracer.span(f"{method} {path}", category="github") as details:
+            response = self._request(
+                method,
+                url,
+                headers=headers,
+                body=body,
+                is_idempotent=method in IDEMPOTENT_METHODS,
+            )
+            details.update(status=response.status, bytes=len(response.body))
+
+        if response.status >= 400:
+            raise GitHubApiError(
+                status=response.status,
+                message=response.body.decode(errors="replace"),
+            )
+
+        return response
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        body: dict | None = None,
+        is_idempotent: bool = False,
+    ) -> ApiResponse:
+        split_url = urlsplit(url)
+        request_path = split_url.path
+        if split_url.query:
+            request_path = f"{request_path}?{split_url.query}"
+
+        request_headers = {
+            "Authorization": f"bearer {self.token}",
+            "Accept": "application/vnd.github+json",
+            "Accept-Encoding": "gzip",
+            "User-Agent": "jeeves-pr-stack",
+            **(headers or {}),
+        }
+        encoded_body = None
+        if body is not None:
+            encoded_body = json.dumps(body).encode()
+            request_headers["Content-Type"] = "application/json"
+
+        connection = self._acquire(split_url.scheme, split_url.netloc)
+        try:
+            http_response = self._send_with_retry(
+                connection,
+                method,
+                request_path,
+                encoded_body,
+                request_headers,
+                is_idempotent=is_idempotent,
+            )
+        except OSError as err:
+            # DNS lookup failed, connection was refused or timed out.
+            connection.close()
+            raise GitHubUnreachable(reason=str(err)) from err
+
+        if http_response.getheader("Content-Encoding") == "gzip":
+            # Decompress while reading, not holding both bodies at once.
+            with gzip.GzipFile(fileobj=http_response) as gzip_file:
+                response_body = gzip_file.read()
+        else:
+            response_body = http_response.read()
+
+        response = ApiResponse(
+            status=http_response.status,
+            headers={
+                header_name.lower(): header_value
+                for header_name, header_value in http_response.getheaders()
+            },
+            body=response_body,
+        )
+
+        if http_response.will_close:
+            connection.close()
+
+        self._connections.put(connection)
+        return response
+
+    def _send_with_retry(
+        self,
+        connection: http.client.HTTPConnection,
+        method: str,
+        request_path: str,
+        encoded_body: bytes | None,
+        request_headers: dict[str, str],
+        is_idempotent: bool,
+    ) -> http.client.HTTPResponse:
+        """
+        Send a request, retrying once if the connection turns out closed.
+
+        The server may close an idle keep-alive connection. A request which
+        could not even be sent is retried on a fresh connection. A request
+        whose response was lost may still have been processed, so it is only
+        retried if sending it twice does no harm.
+        """
+        try:
+            connection.request(
+                method,
+                request_path,
+                body=encoded_body,
+                headers=request_headers,
+            )
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+            connection.request(
+                method,
+                request_path,
+                body=encoded_body,
+                headers=request_headers,
+            )
+
+        try:
+            return connection.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            if not is_idempotent:
+                raise
+
+            connection.close()
+            connection.request(
+                method,
+                request_path,
+                body=encoded_body,
+                headers=request_headers,
+            )
+            return connection.getresponse()
+
+    def _acquire(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        try:
+            return self._connections.get_nowait()
+        except queue.Empty:
+            connection_class = (
+                http.client.HTTPSConnection
+                if scheme == "https"
+                else http.client.HTTPConnection
+            )
+            return connection_class(netloc, timeout=self.timeout)
+
+
+def construct_transport(gh: sh.Command, remote_url: str) -> GitHubTransport:
+    """
+    Choose the fastest way to reach GitHub for the given repository.
+
+    HTTP transport needs a token for the host of the repository, taken from
+    the same environment variables `gh` reads or from `gh` itself; `gh`
+    subprocesses are used whenever that is not possible.
+    """
+    gh_transport = GhTransport(gh=gh)
+    if os.environ.get(TRANSPORT_ENVIRONMENT_VARIABLE) == "gh":
+        return gh_transport
+
+    match = REMOTE_URL_PATTERN.match(remote_url.strip())
+    if match is None:
+        return gh_transport
+
+    host = match.group("host")
+    token_variables = (
+        GITHUB_TOKEN_VARIABLES
+        if host == "github.com"
+        else ENTERPRISE_TOKEN_VARIABLES
+    )
+    token = next(
+        filter(None, map(os.environ.get, token_variables)),
+        None,
+    )
+    if token is None:
+        try:
+            token = str(gh.auth.token("--hostname", host))
+        except sh.ErrorReturnCode:
+            return gh_transport
+
+    return HttpTransport.for_remote(remote_url, token=token.strip())
@@ -0,0 +1,94 @@
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+import sh
+
+from jeeves_pr_stack.logic import JeevesPullRequestStack
+from jeeves_pr_stack.models import ChecksStatus, PullRequest
+from jeeves_pr_stack.transport import GhTransport
+
+
+def construct_pull_request(
+    number: int,
+    branch: str,
+    base_branch: str,
+) -> PullRequest:
+    """PR of a stack, ready to merge."""
+    return PullRequest(
+        number=number,
+        branch=branch,
+        base_branch=base_branch,
+        title=f"Change {number}",
+        url=f"https://github.com/owner/repo/pull/{number}",
+        is_current=False,
+        review_decision="APPROVED",
+        mergeable="MERGEABLE",
+        is_draft=False,
+        reviewers=[],
+        checks_status=ChecksStatus.SUCCESS,
+        author="author",
+        id=f"PR_{number}",
+    )
+
+
+def construct_application(
+    tmp_path: Path,
+    git: sh.Command,
+    script: str,
+) -> JeevesPullRequestStack:
+    """Application talking to a fake `gh`, implemented by the script."""
+    gh_path = tmp_path / "gh"
+    gh_path.write_text(f"#!{sys.executable}\n{textwrap.dedent(script)}")
+    gh_path.chmod(0o755)  # noqa: WPS432
+
+    gh = sh.Command(str(gh_path)).bake(_tty_out=False)
+    application = JeevesPullRequestStack(gh=gh, git=git)
+    application.transport = GhTransport(gh=gh)
+    return application
+
+
+def commit_file(git: sh.Command, work_tree: Path, name: str) -> None:
+    """Write a file named after itself and commit it."""
+    (work_tree / name).write_text(f"{name}\n")
+    git.add(name)
+    git.commit("-m", f"Add {name}")
+
+
+@pytest.fixture
+def work_tree(tmp_path: Path) -> Path:
+    """Clone of a bare remote with `main` and a stack of three branches."""
+    remote = tmp_path / "remote.git"
+    work_tree = tmp_path / "work"
+    sh.git.init("--bare", "--initial-branch", "main", str(remote))
+    sh.git.init("--initial-branch", "main", str(work_tree))
+
+    git = sh.git.bake(_cwd=str(work_tree))
+    git.config("user.name", "Test")
+    git.config("user.email", "test@localhost")
+    git.remote.add("origin", str(remote))
+
+    commit_file(git, work_tree, "README.md")
+    for level in range(1, 4):
+        git.switch("-c", f"stack-{level}")
+        commit_file(git, work_tree, f"level-{level}.txt")
+
+    git.push("origin", "main", "stack-1", "stack-2", "stack-3")
+    return work_tree
+
+
+@pytest.fixture
+def git(work_tree: Path) -> sh.Command:
+    """`git` running in the work tree."""
+    return sh.git.bake(_cwd=str(work_tree), _tty_out=False)
+
+
+@pytest.fixture
+def stack() -> list[PullRequest]:
+    """PRs of the stack in the work tree, bottom to top."""
+    return [
+        construct_pull_request(1, "stack-1", "main"),
+        construct_pull_request(2, "stack-2", "stack-1"),
+        construct_pull_request(3, "stack-3", "stack-2"),
+    ]
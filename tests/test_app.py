@@ -0,0 +1,11 @@
+import pytest
+from typer.testing import CliRunner
+
+from jeeves_pr_stack.app import app
+
+
+@pytest.mark.parametrize("count", ["0", "-1"])
+def test_pop_count_must_be_positive(count):
+    result = CliRunner().invoke(app, ["pop", "--count", count])
+
+    assert result.exit_code == 2
@@ -0,0 +1,41 @@
+import threading
+
+from jeeves_pr_stack.cache import SnapshotCache
+from jeeves_pr_stack.errors import GitHubApiError
+from jeeves_pr_stack.models import CachePolicy, Snapshot, State
+
+
+def test_failed_revalidation_leaves_snapshot_stale(tmp_path):
+    is_probed = threading.Event()
+
+    def probe(etag):  # noqa: WPS430
+        is_probed.wait()
+        raise GitHubApiError(status=502, message="Bad Gateway")
+
+    cache = SnapshotCache(directory=tmp_path, probe=probe)
+    cache.store("key", Snapshot(etag="etag", fetched_at=0, payload="cached"))
+    threads_before = set(threading.enumerate())
+
+    payload = cache.retrieve(
+        "key",
+        fetch=lambda: "fetched",
+        policy=CachePolicy.STALE_WHILE_REVALIDATE,
+    )
+    [revalidation] = set(threading.enumerate()) - threads_before
+    is_probed.set()
+    revalidation.join()
+
+    assert revalidation.daemon
+    assert payload == "cached"
+    assert cache.stale_since is not None
+    assert cache.load("key").payload == "cached"
+
+
+def test_mutating_commands_revalidate_the_stack():
+    state = State(
+        construct_application=lambda cache_policy: cache_policy,
+        cache_policy=CachePolicy.OFFLINE,
+    )
+    state.is_mutating = True
+
+    assert state.application == CachePolicy.FRESH
@@ -0,0 +1,84 @@
+import itertools
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from jeeves_pr_stack import daemon
+from jeeves_pr_stack.errors import DaemonAlreadyRunning
+from jeeves_pr_stack.models import FailedChecks, ServedStack
+from tests.conftest import construct_pull_request
+
+
+def construct_application(branch: str, versions=itertools.count()):
+    """Application whose default branch changes every time it is built."""
+    served_stack = ServedStack(
+        stack=[construct_pull_request(1, branch, "main")],
+        default_branch=f"main-{next(versions)}",
+        failed_checks={branch: FailedChecks(names=["lint"], count=1)},
+        stale_since=1700000000.0,
+        is_unreachable=True,
+    )
+    return SimpleNamespace(retrieve_stack=lambda may_be_served: served_stack)
+
+
+@pytest.fixture
+def running_daemon(tmp_path):
+    """Daemon listening in a background thread."""
+    stack_daemon = daemon.StackDaemon(
+        socket_path=tmp_path / daemon.SOCKET_FILE_NAME,
+        construct_application=construct_application,
+    )
+    threading.Thread(target=stack_daemon.serve_forever, daemon=True).start()
+
+    for _attempt in range(50):
+        if daemon.request(stack_daemon.socket_path, {"method": "ping"}):
+            break
+        time.sleep(0.01)
+
+    yield stack_daemon
+    daemon.request(stack_daemon.socket_path, {"method": "stop"})
+
+
+def test_second_daemon_refuses_to_start(running_daemon):
+    second_daemon = daemon.StackDaemon(
+        socket_path=running_daemon.socket_path,
+        construct_application=lambda branch: None,
+    )
+    with pytest.raises(DaemonAlreadyRunning):
+        second_daemon.serve_forever()
+
+    assert daemon.request(running_daemon.socket_path, {"method": "ping"})
+
+
+def test_socket_left_behind_is_removed(tmp_path):
+    socket_path = tmp_path / daemon.SOCKET_FILE_NAME
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as abandoned:
+        abandoned.bind(str(socket_path))
+
+    daemon.claim_socket(socket_path)
+
+    assert not socket_path.exists()
+
+
+def test_refresh_discards_served_stacks(running_daemon):
+    socket_path = running_daemon.socket_path
+    served_stack = daemon.request_stack(socket_path, "feature")
+    assert daemon.request_stack(socket_path, "feature") == served_stack
+
+    daemon.request(socket_path, {"method": "refresh"})
+
+    assert daemon.request_stack(socket_path, "feature") != served_stack
+
+
+def test_served_stack_tells_how_stale_it_is(running_daemon):
+    served_stack = daemon.request_stack(running_daemon.socket_path, "feature")
+
+    assert served_stack.stack == [construct_pull_request(1, "feature", "main")]
+    assert served_stack.failed_checks == {
+        "feature": FailedChecks(names=["lint"], count=1),
+    }
+    assert served_stack.stale_since == 1700000000.0  # noqa: WPS432
+    assert served_stack.is_unreachable
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from jeeves_pr_stack import logic
+from jeeves_pr_stack.errors import CyclicStack
+
+
+def test_broken_repositories_are_reported_in_their_rows(monkeypatch):
+    failures = {
+        "owner/cyclic": CyclicStack(branches=["a", "b", "a"]),
+        "owner/unreadable": PermissionError("Permission denied"),
+    }
+
+    def construct_application_for(target, cache_policy):  # noqa: WPS430
+        def list_stacks(author):  # noqa: WPS430
+            raise failures[target]
+
+        return SimpleNamespace(list_stacks=list_stacks)
+
+    monkeypatch.setattr(
+        logic,
+        "construct_application_for",
+        construct_application_for,
+    )
+
+    cyclic, unreadable = logic.collect_dashboard(list(failures))
+
+    assert "a → b → a" in cyclic.error
+    assert unreadable.error == "Permission denied"
@@ -0,0 +1,104 @@
+from jeeves_pr_stack import github
+from jeeves_pr_stack.models import NavigationComment
+
+MARKER = "<!-- jeeves-pr-stack -->"
+
+
+class FakeTransport:
+    """Serves a PR with a navigation comment followed by 150 others."""
+
+    def graphql(self, query: str, **variables) -> dict:
+        """Return the latest page of comments, or the one before it."""
+        navigation_comment = {
+            "databaseId": 1,
+            "body": f"{MARKER}\nStack",
+            "viewerDidAuthor": True,
+        }
+        other_comments = [
+            {"databaseId": number, "body": "LGTM", "viewerDidAuthor": False}
+            for number in range(2, 152)
+        ]
+
+        if "EarlierComments" in query:
+            assert variables == {"id": "PR_1", "before": "cursor-51"}
+            return {
+                "node": {
+                    "comments": {
+                        "pageInfo": {
+                            "hasPreviousPage": False,
+                            "startCursor": "cursor-1",
+                        },
+                        "nodes": [navigation_comment, *other_comments[:50]],
+                    },
+                },
+            }
+
+        return {
+            "nodes": [
+                {
+                    "id": "PR_1",
+                    "comments": {
+                        "pageInfo": {
+                            "hasPreviousPage": True,
+                            "startCursor": "cursor-51",
+                        },
+                        "nodes": other_comments[50:],
+                    },
+                },
+            ],
+        }
+
+
+def test_navigation_comment_is_found_beyond_latest_page():
+    navigation_comments = github.retrieve_navigation_comments(
+        FakeTransport(),
+        ids=["PR_1"],
+        marker=MARKER,
+    )
+
+    assert navigation_comments == {
+        "PR_1": NavigationComment(id=1, body=f"{MARKER}\nStack"),
+    }
+
+
+class FailingChecksTransport:
+    """Serves a PR with 150 failed check runs, of which 100 are listed."""
+
+    def graphql(self, query: str, **variables) -> dict:
+        """Return the first page of checks along with their counts."""
+        check_nodes = [
+            {"name": f"check-{index}", "conclusion": "FAILURE"}
+            for index in range(100)
+        ]
+        contexts = {
+            "checkRunCountsByState": [
+                {"state": "FAILURE", "count": 150},
+                {"state": "SUCCESS", "count": 20},
+            ],
+            "statusContextCountsByState": [{"state": "ERROR", "count": 1}],
+            "nodes": check_nodes,
+        }
+        return {
+            "nodes": [
+                {
+                    "id": "PR_1",
+                    "commits": {
+                        "nodes": [
+                            {"commit": {"statusCheckRollup": {
+                                "contexts": contexts,
+                            }}},
+                        ],
+                    },
+                },
+            ],
+        }
+
+
+def test_failed_checks_are_counted_beyond_first_page():
+    [failed_checks] = github.retrieve_failed_checks(
+        FailingChecksTransport(),
+        ids=["PR_1"],
+    ).values()
+
+    assert failed_checks.count == 151
+    assert len(failed_checks.names) == 100
@@ -0,0 +1,59 @@
+import pytest
+
+from jeeves_pr_stack.errors import GitHubApiError
+from tests.conftest import construct_application
+
+# Stands in for `gh`: every PR is mergeable, but merging is refused.
+FAKE_GH = """
+import json
+import sys
+
+arguments = sys.argv[1:]
+if arguments[:2] == ["api", "graphql"]:
+    print(json.dumps({"data": {"node": {
+        "mergeable": "MERGEABLE",
+        "mergeStateStatus": "CLEAN",
+        "commits": {"nodes": []},
+    }}}))
+elif arguments[-1].endswith("/merge"):
+    sys.stdin.read()
+    print("HTTP/2.0 405 Method Not Allowed\\r\\n\\r\\n" + json.dumps(
+        {"message": "Pull Request is not mergeable"},
+    ))
+    sys.exit(1)
+else:
+    sys.stdin.read()
+    print("HTTP/2.0 200 OK\\r\\n\\r\\n{}")
+"""
+
+# `gh api graphql` prints the response & fails if the query has errors.
+FAKE_GH_WITH_GRAPHQL_ERRORS = """
+import json
+import sys
+
+print(json.dumps({"data": None, "errors": [{"message": "Not found"}]}))
+sys.exit(1)
+"""
+
+
+def test_pop_stops_when_merge_is_refused(tmp_path, git, stack):
+    """A refused merge is an error; the branch of the PR stays."""
+    application = construct_application(tmp_path, git, FAKE_GH)
+
+    with pytest.raises(GitHubApiError) as error_info:
+        list(application.pop(stack, count=1, default_branch="main"))
+
+    assert error_info.value.status == 405  # noqa: WPS432
+    assert git("ls-remote", "--heads", "origin", "stack-1").strip()
+
+
+def test_pop_stops_on_graphql_errors(tmp_path, git, stack):
+    """Errors in a GraphQL response are not taken for data."""
+    application = construct_application(
+        tmp_path,
+        git,
+        FAKE_GH_WITH_GRAPHQL_ERRORS,
+    )
+
+    with pytest.raises(GitHubApiError):
+        list(application.pop(stack, count=1, default_branch="main"))
@@ -0,0 +1,69 @@
+import pytest
+import sh
+
+from jeeves_pr_stack.errors import MergeConflicts
+from jeeves_pr_stack.rebase import StackRebase
+from tests.conftest import commit_file
+
+
+def _contains(git: sh.Command, ancestor: str, descendant: str) -> bool:
+    try:
+        git("merge-base", "--is-ancestor", ancestor, descendant)
+    except sh.ErrorReturnCode_1:
+        return False
+
+    return True
+
+
+@pytest.mark.parametrize("current_branch", ["stack-1", "stack-2", "stack-3"])
+def test_rebase_from_any_branch_of_stack(
+    work_tree,
+    git,
+    stack,
+    current_branch,
+):
+    """Every branch is rebased & pushed, the checked out one included."""
+    git.switch("main")
+    commit_file(git, work_tree, "upstream.txt")
+    git.push("origin", "main")
+    git.switch(current_branch)
+
+    list(StackRebase(git=git, stack=stack).run())
+
+    assert git.branch("--show-current").strip() == current_branch
+    for pr in stack:
+        assert _contains(git, "main", f"refs/heads/{pr.branch}")
+        assert _contains(git, pr.base_branch, f"refs/heads/{pr.branch}")
+        assert git("rev-parse", pr.branch) == git(
+            "rev-parse",
+            f"origin/{pr.branch}",
+        )
+
+
+def test_rebase_resumes_after_conflict(tmp_path, work_tree, git, stack):
+    """Conflict → `git rebase --continue` → rebase again pushes it all."""
+    git.switch("main")
+    (work_tree / "level-2.txt").write_text("upstream\n")
+    git.add("level-2.txt")
+    git.commit("-m", "Conflict with stack-2")
+    git.push("origin", "main")
+    git.switch("stack-3")
+    plan_path = tmp_path / "rebase.json"
+
+    with pytest.raises(MergeConflicts):
+        list(StackRebase(git=git, stack=stack, plan_path=plan_path).run())
+
+    (work_tree / "level-2.txt").write_text("resolved\n")
+    git.add("level-2.txt")
+    git("-c", "core.editor=true", "rebase", "--continue")
+
+    list(StackRebase(git=git, stack=stack, plan_path=plan_path).run())
+
+    assert not plan_path.exists()
+    for pr in stack:
+        assert _contains(git, "main", f"refs/heads/{pr.branch}")
+        assert _contains(git, pr.base_branch, f"refs/heads/{pr.branch}")
+        assert git("rev-parse", pr.branch) == git(
+            "rev-parse",
+            f"origin/{pr.branch}",
+        )
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from jeeves_pr_stack.errors import GitHubUnreachable
+from jeeves_pr_stack.models import MutationKind, QueuedMutation
+from tests.conftest import commit_file, construct_application
+
+# Stands in for `gh`: GitHub is reachable, every request succeeds.
+FAKE_GH = """
+import sys
+
+if sys.argv[1:3] == ["pr", "create"]:
+    print("https://github.com/owner/repo/pull/4")
+else:
+    print("HTTP/2.0 200 OK\\r\\n\\r\\n{}")
+"""
+
+
+@pytest.fixture
+def application(tmp_path, git, work_tree):
+    """Application with `feature` pushed onto `stack-3` queued offline."""
+    git.switch("-c", "feature")
+    commit_file(git, work_tree, "feature.txt")
+
+    application = construct_application(tmp_path, git, FAKE_GH)
+    application.queue_mutation(
+        QueuedMutation(
+            kind=MutationKind.PUSH,
+            branch="feature",
+            queued_at=time.time(),
+            base_branch="stack-3",
+        ),
+    )
+    return application
+
+
+def test_push_stays_queued_while_remote_is_unreachable(git, application):
+    git.remote("set-url", "--push", "origin", "/nonexistent/remote.git")
+
+    with pytest.raises(GitHubUnreachable):
+        list(application.replay_mutations())
+
+    assert len(application.outbox.read()) == 1
+
+
+def test_rejected_push_is_dropped(git, work_tree, application):
+    git.push("origin", "feature")
+    git.commit("--amend", "-m", "Rewrite feature")
+
+    [replayed] = application.replay_mutations()
+
+    assert "[rejected]" in replayed.blocker
+    assert not application.outbox.read()
+
+
+def test_push_is_replayed(git, application):
+    [replayed] = application.replay_mutations()
+
+    assert replayed.blocker is None
+    assert git("ls-remote", "--heads", "origin", "feature").strip()
+    assert not application.outbox.read()
@@ -0,0 +1,60 @@
+from jeeves_pr_stack import github
+from jeeves_pr_stack.stack_index import StackIndex
+
+
+def construct_raw_topology(
+    number: int,
+    branch: str,
+    base_branch: str,
+    is_cross_repository: bool = False,
+) -> dict:
+    """Raw topology of a PR, as the GraphQL API returns it."""
+    return {
+        "number": number,
+        "id": f"PR_{number}",
+        "headRefName": branch,
+        "baseRefName": base_branch,
+        "isCrossRepository": is_cross_repository,
+        "author": {"login": "author"},
+    }
+
+
+def construct_stack_index(raw_pull_requests: list[dict]) -> StackIndex:
+    """Index PRs the way the app does."""
+    return StackIndex.from_pull_requests(
+        github.construct_pull_request_refs(raw_pull_requests),
+    )
+
+
+def test_fork_pr_from_main_to_main_is_no_cycle():
+    stack_index = construct_stack_index([
+        construct_raw_topology(1, "feature", "main"),
+        construct_raw_topology(2, "main", "main", is_cross_repository=True),
+    ])
+
+    assert stack_index.stack_for_branch("feature") == ["feature"]
+    assert stack_index.forest() == {"main": ["feature"]}
+
+
+def test_pr_from_branch_to_itself_is_no_edge():
+    stack_index = construct_stack_index([
+        construct_raw_topology(1, "feature", "main"),
+        construct_raw_topology(2, "main", "main"),
+    ])
+
+    assert stack_index.stack_for_branch("feature") == ["feature"]
+    assert stack_index.forest() == {"main": ["feature"]}
+
+
+def test_fork_prs_do_not_shadow_branches_of_the_repo():
+    raw_pull_requests = [
+        construct_raw_topology(1, "patch-1", "main"),
+        construct_raw_topology(2, "patch-1", "release", True),
+        construct_raw_topology(3, "patch-1", "main", True),
+    ]
+
+    pull_request_refs = github.construct_pull_request_refs(raw_pull_requests)
+    stack_index = StackIndex.from_pull_requests(pull_request_refs)
+
+    assert [pr.number for pr in pull_request_refs] == [1]
+    assert stack_index.stack_for_branch("patch-1") == ["patch-1"]
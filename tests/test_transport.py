@@ -0,0 +1,130 @@
+import http.server
+import threading
+
+import pytest
+import sh
+
+from jeeves_pr_stack import transport as transport_module
+from jeeves_pr_stack.errors import GitHubUnreachable
+from jeeves_pr_stack.transport import HttpTransport
+
+
+class DisconnectingHandler(http.server.BaseHTTPRequestHandler):
+    """Read each request, then hang up without a response."""
+
+    def handle_one_request(self):
+        self.raw_requestline = self.rfile.readline()
+        if self.raw_requestline:
+            self.server.request_count += 1
+        self.close_connection = True
+
+    def log_message(self, *args):
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def server():
+    """HTTP server which accepts requests but never answers them."""
+    http_server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        DisconnectingHandler,
+    )
+    http_server.request_count = 0
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield http_server
+    http_server.shutdown()
+    http_server.server_close()
+
+
+@pytest.fixture
+def transport(server) -> HttpTransport:
+    """Transport pointed at the local server."""
+    host, port = server.server_address
+    return HttpTransport(
+        api_url=f"http://{host}:{port}",
+        graphql_url=f"http://{host}:{port}/graphql",
+        token="token",
+        owner="owner",
+        repo="repo",
+        timeout=5,
+    )
+
+
+def test_get_is_retried_when_response_is_lost(server, transport):
+    with pytest.raises(GitHubUnreachable):
+        transport.rest("GET", "repos/{owner}/{repo}/pulls")
+
+    assert server.request_count == 2
+
+
+def test_merge_is_not_sent_twice_when_response_is_lost(server, transport):
+    with pytest.raises(GitHubUnreachable):
+        transport.rest("PUT", "repos/{owner}/{repo}/pulls/1/merge", body={})
+
+    assert server.request_count == 1
+
+
+def test_graphql_mutation_is_not_sent_twice(server, transport):
+    with pytest.raises(GitHubUnreachable):
+        transport.graphql("mutation AddComment { addComment { id } }")
+
+    assert server.request_count == 1
+
+
+class FakeGh:
+    """Stands in for `gh auth token`, which knows no host."""
+
+    def __init__(self):
+        self.auth = self
+        self.hosts: list[str] = []
+
+    def token(self, *arguments):
+        """Fail like `gh` does for a host it is not logged in to."""
+        self.hosts.append(arguments[-1])
+        raise sh.ErrorReturnCode_1(
+            full_cmd="gh auth token",
+            stdout=b"",
+            stderr=b"not logged in",
+        )
+
+
+@pytest.fixture
+def github_token(monkeypatch):
+    """Token for `github.com`, set the way CI sets it."""
+    for variable_name in ("GH_ENTERPRISE_TOKEN", "GITHUB_ENTERPRISE_TOKEN"):
+        monkeypatch.delenv(variable_name, raising=False)
+    monkeypatch.delenv("JEEVES_PR_STACK_TRANSPORT", raising=False)
+    monkeypatch.setenv("GH_TOKEN", "github-token")
+
+
+def test_github_token_is_sent_to_github(github_token):
+    transport = transport_module.construct_transport(
+        gh=FakeGh(),
+        remote_url="git@github.com:owner/repo.git",
+    )
+
+    assert transport.token == "github-token"
+
+
+def test_github_token_is_not_sent_elsewhere(github_token):
+    gh = FakeGh()
+    transport = transport_module.construct_transport(
+        gh=gh,
+        remote_url="https://git.example.com/owner/repo.git",
+    )
+
+    assert isinstance(transport, transport_module.GhTransport)
+    assert gh.hosts == ["git.example.com"]
+
+
+def test_enterprise_token_is_sent_to_enterprise(github_token, monkeypatch):
+    monkeypatch.setenv("GH_ENTERPRISE_TOKEN", "enterprise-token")
+
+    transport = transport_module.construct_transport(
+        gh=FakeGh(),
+        remote_url="https://git.example.com/owner/repo.git",
+    )
+
+    assert transport.token == "enterprise-token"
+    assert transport.api_url == "https://git.example.com/api/v3"
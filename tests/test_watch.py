@@ -0,0 +1,42 @@
+import itertools
+import time
+
+from tests.conftest import construct_application
+
+
+def test_watch_survives_failed_polls(tmp_path, git, stack, monkeypatch):
+    """Failures of GitHub or git are reported, polling goes on."""
+    application = construct_application(tmp_path, git, "")
+    list_stack_failures = iter([OSError("Network is unreachable")])
+    branch_state_failures = iter([True])
+
+    def list_stack():  # noqa: WPS430
+        failure = next(list_stack_failures, None)
+        if failure is not None:
+            raise failure
+
+        return stack
+
+    def collect_branch_states(stack):  # noqa: WPS430
+        if next(branch_state_failures, False):
+            git("rev-parse", "--verify", "no-such-branch")
+
+        return {}
+
+    monkeypatch.setattr(application, "list_stack", list_stack)
+    monkeypatch.setattr(
+        application,
+        "collect_branch_states",
+        collect_branch_states,
+    )
+    monkeypatch.setattr(time, "sleep", lambda interval: None)
+
+    network_failure, git_failure, recovery = itertools.islice(
+        application.watch_stack(),
+        3,
+    )
+
+    assert network_failure.error == "Network is unreachable"
+    assert "rev-parse" in git_failure.error
+    assert recovery.stack == stack
+    assert recovery.error is None